@@ -1,5 +1,14 @@
+import codecs
+import mmap as _mmap
+import os
 import re
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from types import MappingProxyType
 from mcl_tokens import *
+from mapa_fuente import SourceMap
 
 class TrieNode:
     def __init__(self):
@@ -28,111 +37,537 @@ class Trie:
                 match_token, match_end = nodo.token, i
         return match_token, match_end
 
+# Tablas de palabras clave construidas una sola vez al importar el módulo y
+# compartidas (sólo lectura) por todos los analizadores.
+TRIE_PALABRAS = Trie()
+DELIMITADORES = frozenset(' \t\n"={}[]();,.:#')
+
+# Palabras reservadas y unidades resueltas de antemano: lexema -> (tipo, valor)
+_palabras_clave = {}
+for _palabra in list(CODIGOS_TOKEN_RESERVADAS) + list(CODIGOS_TOKEN_UNIDADES):
+    if _palabra in OPERADORES_VERBALES:
+        _palabras_clave[_palabra] = (TipoToken.OPERADOR, OPERADORES_VERBALES[_palabra])
+    else:
+        _palabras_clave[_palabra] = (TOKEN_CATEGORIES[_palabra], _palabra)
+PALABRAS_CLAVE = MappingProxyType(_palabras_clave)
+
+# Expresión regular maestra. Cada alternativa reproduce una rama del AFD; los
+# casos Unicode raros (letras que no son isalpha, dígitos no decimales) se
+# delegan al AFD para que ambos modos produzcan exactamente los mismos tokens.
+PATRON_LEXICO = re.compile(r'''\s*+(?:
+     (?P<palabra>[^\W\d_][^ \t\n"={}\[\]();,.:\#]*)
+    |(?P<numero>-?\d+(?:\.\d*)?)
+    |(?P<texto>"[^"]*"?)
+    |(?P<comentario>\#[^\n]*)
+    |(?P<operador>->|<=|>=|!=|==|=>|[=+\-*/@<>])
+    |(?P<llave>[{}])
+    |(?P<par_corchete>[()\[\]])
+    |(?P<puntuacion>[;,.:])
+    |(?P<otro>.)
+    |(?P<fin>\Z)
+)''', re.VERBOSE | re.DOTALL)
+
+_PATRON_PALABRA_VALIDA = re.compile(r'\w+')
+
+# Versión sobre bytes de la expresión maestra para analizar un mmap sin
+# decodificarlo. Todo byte no ASCII entra por `palabra`; si el carácter no es
+# una letra (espacios, dígitos o símbolos Unicode) se delega a _paso_bytes.
+PATRON_LEXICO_BYTES = re.compile(rb'''[ \t\n\r\x0b\x0c\x1c-\x1f]*+(?:
+     (?P<palabra>[A-Za-z\x80-\xff][^ \t\n"={}\[\]();,.:\#]*)
+    |(?P<numero>-?[0-9]+(?:\.[0-9]*)?)
+    |(?P<texto>"[^"]*"?)
+    |(?P<comentario>\#[^\n]*)
+    |(?P<operador>->|<=|>=|!=|==|=>|[=+\-*/@<>])
+    |(?P<llave>[{}])
+    |(?P<par_corchete>[()\[\]])
+    |(?P<puntuacion>[;,.:])
+    |(?P<otro>[\x00-\x7f])
+    |(?P<fin>\Z)
+)''', re.VERBOSE | re.DOTALL)
+
+# Para partir un archivo en fragmentos que se puedan analizar por separado:
+# consume desde una posición todo lo que no es una cadena o comentario sin
+# cerrar antes del límite (endpos), y busca el siguiente ';' o salto de línea.
+_PATRON_SIN_CORTAR = re.compile(r'(?:[^"#]++|"[^"]*+"|\#[^\n]*+(?=\n))*+')
+_PATRON_OPACO = re.compile(r'"[^"]*"?|\#[^\n]*')
+_PATRON_CORTE = re.compile(r'"[^"]*"?|\#[^\n]*|[;\n]')
+
+_palabras_clave_bytes = {lex.encode(): clave for lex, clave in _palabras_clave.items()}
+
+_TIPOS_GRUPO = {
+    "operador": TipoToken.OPERADOR,
+    "llave": TipoToken.LLAVE,
+    "par_corchete": TipoToken.PAR_CORCHETE,
+    "puntuacion": TipoToken.PUNTUACION,
+    "comentario": TipoToken.COMENTARIO,
+    "otro": TipoToken.DESCONOCIDO,
+}
+
 class AFD_Lexico:
-    def __init__(self, texto):
+    # modo="regex" usa la expresión maestra; modo="afd" conserva el autómata
+    # carácter por carácter como implementación de referencia. Sin contexto
+    # explícito cada analizador usa tablas de códigos propias.
+    def __init__(self, texto, modo="regex", contexto=None):
+        if modo not in ("regex", "afd", "bytes"):
+            raise ValueError(f"Modo de análisis léxico desconocido: '{modo}'")
         self.texto, self.i = texto, 0
+        self.modo = modo
+        self.contexto = CompilationContext() if contexto is None else contexto
         self.n = len(texto)
         self.tokens = []
-        self.trie = Trie()
-        self.delims = set(' \t\n"={}[]();,.:#')
+        self.fabrica = self._crear_token
+        self.trie = TRIE_PALABRAS
+        self.delims = DELIMITADORES
+        self._mapa_fuente = None
+
+    # Analiza un archivo .mcl. Con mmap=True el texto es un mmap de sólo
+    # lectura que no se decodifica completo: los tokens son TokenPerezoso con
+    # offsets en bytes y su valor se decodifica al pedirlo. Con mmap=False se
+    # lee el archivo como texto y los offsets son en caracteres.
+    @classmethod
+    def from_path(cls, path, mmap=True, contexto=None):
+        if not mmap:
+            with open(path, encoding="utf-8", newline="") as f:
+                return cls(f.read(), contexto=contexto)
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                fuente = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+            else:
+                fuente = b""
+        lexico = cls(fuente, "bytes", contexto)
+        lexico.fabrica = lexico._crear_perezoso
+        return lexico
+
+    # SourceMap del texto analizado, construido la primera vez que se pide
+    @property
+    def mapa_fuente(self):
+        if self._mapa_fuente is None:
+            self._mapa_fuente = SourceMap(self.texto)
+        return self._mapa_fuente
+
+    def _crear_token(self, tipo, valor, inicio, fin):
+        return Token(tipo, valor, inicio, fin, self.contexto)
+
+    # valor sólo se usa para calcular el código; es None en cadenas y comentarios
+    def _crear_perezoso(self, tipo, valor, inicio, fin):
+        return TokenPerezoso(tipo, self.texto, inicio, fin, self.contexto.codigo(tipo, valor))
 
     def emitir(self, tipo, valor, inicio, fin):
-        self.tokens.append(Token(tipo, valor, inicio, fin))
+        self.tokens.append(self.fabrica(tipo, valor, inicio, fin))
 
     def run(self):
-        while self.i < self.n:
-            c = self.texto[self.i]
-            if c.isspace():
-                self.i += 1
-                continue
-            inicio = self.i
-            if c.isalpha():
-                j, err = self.i, False
-                while j < self.n and self.texto[j] not in self.delims:
-                    if not (self.texto[j].isalnum() or self.texto[j] == '_'):
-                        err = True
-                    j += 1
-                lex = self.texto[inicio:j]
-                palabra, fin = (None, None)
-                if not err:
-                    palabra, fin = self.trie.buscar(lex, 0)
-                    if palabra and fin != len(lex):
-                        palabra = None
-                if palabra:
-                    # CONVERTIR PALABRAS A OPERADORES
-                    if palabra in OPERADORES_VERBALES:
-                        tipo_token = TipoToken.OPERADOR
-                        valor_token = OPERADORES_VERBALES[palabra]
-                        self.emitir(tipo_token, valor_token, inicio, j)
+        if self.modo == "afd":
+            while self.i < self.n:
+                self._paso_afd()
+            return self.tokens
+        if self.modo == "bytes":
+            return self._run_bytes()
+        return self._run_regex()
+
+    # Igual que run() pero guarda los tokens en columnas (ver TokenArray)
+    def run_compacto(self):
+        self.tokens = TokenArray(self.texto, self.contexto)
+        self.fabrica = _token_crudo
+        return self.run()
+
+    # Reanaliza sólo la zona editada. self.texto es el texto ya editado y la
+    # edición reemplazó `eliminado` caracteres en `offset` por `insertado`.
+    # Se reanaliza desde el último token que no puede verse afectado hasta que
+    # un token nuevo vuelve a empezar donde empezaba uno previo; desde ahí se
+    # reutilizan los tokens previos desplazando sus offsets (los objetos Token
+    # de la lista previa se modifican en el lugar). Para que los códigos sean
+    # coherentes debe usarse el mismo contexto que produjo tokens_previos.
+    def relexar(self, tokens_previos, offset, eliminado, insertado):
+        delta = len(insertado) - eliminado
+        fin_edicion = offset + len(insertado)
+        fin_eliminado = offset + eliminado
+        # Un token [inicio, fin) depende también del carácter en `fin`
+        k = bisect_left(tokens_previos, offset, key=lambda t: t.fin)
+        reinicio = tokens_previos[k - 1].fin if k else 0
+        j = bisect_left(tokens_previos, fin_eliminado, lo=k, key=lambda t: t.inicio)
+        nuevos = []
+        pos, ventana = reinicio, max(256, 2 * len(insertado))
+        sincronizado = False
+        while not sincronizado and pos < self.n:
+            limite = min(self.n, pos + ventana)
+            lexico = AFD_Lexico(self.texto[pos:limite], self.modo)
+            lexico.fabrica = _token_crudo
+            avance = None
+            for tipo, valor, inicio, fin in lexico.run():
+                inicio, fin = inicio + pos, fin + pos
+                if limite < self.n and fin >= limite:
+                    avance = inicio
+                    break
+                if inicio >= fin_edicion:
+                    while j < len(tokens_previos) and tokens_previos[j].inicio + delta < inicio:
+                        j += 1
+                    if j < len(tokens_previos) and tokens_previos[j].inicio + delta == inicio:
+                        sincronizado = True
+                        break
+                nuevos.append(self.fabrica(tipo, valor, inicio, fin))
+            else:
+                avance = limite
+            if avance is None or avance == pos:
+                ventana *= 2
+            else:
+                pos = avance
+        if not sincronizado:
+            j = len(tokens_previos)
+        resto = tokens_previos[j:]
+        if delta:
+            for t in resto:
+                t.inicio += delta
+                t.fin += delta
+        self.rango_cambiado = (k, j, k + len(nuevos))
+        self.i = self.n
+        self.tokens = tokens_previos[:k] + nuevos + resto
+        return self.tokens
+
+    def _run_regex(self):
+        texto, n = self.texto, self.n
+        tokens = self.tokens
+        agregar, crear = tokens.append, self.fabrica
+        palabras, tipos = _palabras_clave, _TIPOS_GRUPO
+        palabra_valida = _PATRON_PALABRA_VALIDA.fullmatch
+        pos = self.i
+        while pos < n:
+            for m in PATRON_LEXICO.finditer(texto, pos):
+                grupo = m.lastgroup
+                if grupo == "fin":
+                    break
+                inicio, fin = m.span(grupo)
+                lex = m.group(grupo)
+                if grupo == "palabra":
+                    if not lex[0].isalpha():
+                        break
+                    clave = palabras.get(lex)
+                    if clave:
+                        agregar(crear(clave[0], clave[1], inicio, fin))
+                    elif palabra_valida(lex):
+                        agregar(crear(TipoToken.IDENTIFICADOR, lex, inicio, fin))
                     else:
-                        tipo = TOKEN_CATEGORIES[lex]
-                        self.emitir(tipo, lex, inicio, j)
+                        agregar(crear(TipoToken.DESCONOCIDO, lex, inicio, fin))
+                elif grupo == "numero":
+                    if fin < n and texto[fin].isdigit():
+                        break
+                    agregar(crear(TipoToken.NUMERO, lex, inicio, fin))
+                elif grupo == "texto":
+                    cerrado = len(lex) > 1 and lex[-1] == '"'
+                    agregar(crear(TipoToken.TEXTO if cerrado else TipoToken.DESCONOCIDO, lex, inicio, fin))
                 else:
-                    tp = TipoToken.IDENTIFICADOR if not err else TipoToken.DESCONOCIDO
-                    self.emitir(tp, lex, inicio, j)
-                self.i = j
-                continue
-            if c == '-' and self.i + 1 < self.n and self.texto[self.i + 1].isdigit():
-                self.i += 1  # Avanzar pasado el signo '-'
-                while self.i < self.n and self.texto[self.i].isdigit():
-                    self.i += 1
-                if self.i < self.n and self.texto[self.i] == '.':
-                    self.i += 1
-                    while self.i < self.n and self.texto[self.i].isdigit():
-                        self.i += 1
-                val = self.texto[inicio:self.i]
-                self.emitir(TipoToken.NUMERO, val, inicio, self.i)
-                continue
-            if c.isdigit():
+                    if lex == "-" and fin < n and texto[fin].isdigit():
+                        break
+                    if grupo == "operador" and fin == n and len(lex) == 1:
+                        # El AFD avanza dos posiciones con un operador simple al final del texto
+                        fin += 1
+                    agregar(crear(tipos[grupo], lex, inicio, fin))
+            else:
+                break
+            if grupo == "fin":
+                break
+            # Caso no cubierto por la expresión: un paso del AFD y se reanuda
+            self.i = inicio
+            self._paso_afd()
+            pos = self.i
+        self.i = n
+        return tokens
+
+    # Igual que _run_regex pero sobre self.texto en bytes (ver from_path)
+    def _run_bytes(self):
+        fuente, n = self.texto, self.n
+        agregar, crear = self.tokens.append, self.fabrica
+        palabras, tipos = _palabras_clave_bytes, _TIPOS_GRUPO
+        palabra_valida = _PATRON_PALABRA_VALIDA.fullmatch
+        pos = self.i
+        while pos < n:
+            for m in PATRON_LEXICO_BYTES.finditer(fuente, pos):
+                grupo = m.lastgroup
+                if grupo == "fin":
+                    break
+                inicio, fin = m.span(grupo)
+                if grupo == "texto":
+                    cerrado = fin - inicio > 1 and fuente[fin - 1] == 0x22
+                    agregar(crear(TipoToken.TEXTO if cerrado else TipoToken.DESCONOCIDO, None, inicio, fin))
+                    continue
+                if grupo == "comentario":
+                    agregar(crear(TipoToken.COMENTARIO, "#" if fin - inicio == 1 else None, inicio, fin))
+                    continue
+                lex = m.group(grupo)
+                if grupo == "palabra":
+                    clave = palabras.get(lex)
+                    if clave:
+                        agregar(crear(clave[0], clave[1], inicio, fin))
+                        continue
+                    lex = lex.decode("utf-8")
+                    if not lex[0].isalpha():
+                        break
+                    tipo = TipoToken.IDENTIFICADOR if palabra_valida(lex) else TipoToken.DESCONOCIDO
+                    agregar(crear(tipo, lex, inicio, fin))
+                elif grupo == "numero":
+                    if fin < n and fuente[fin] >= 0x80 and _caracter_utf8(fuente, fin)[0].isdigit():
+                        break
+                    agregar(crear(TipoToken.NUMERO, lex.decode("ascii"), inicio, fin))
+                else:
+                    lex = lex.decode("ascii")
+                    if lex == "-" and fin < n and fuente[fin] >= 0x80 and _caracter_utf8(fuente, fin)[0].isdigit():
+                        break
+                    if grupo == "operador" and fin == n and len(lex) == 1:
+                        fin += 1
+                    agregar(crear(tipos[grupo], lex, inicio, fin))
+            else:
+                break
+            if grupo == "fin":
+                break
+            self.i = inicio
+            self._paso_bytes()
+            pos = self.i
+        self.i = n
+        return self.tokens
+
+    # Un paso del AFD sobre bytes para los casos que la expresión no cubre:
+    # espacios Unicode, números con dígitos no ASCII y símbolos no ASCII.
+    def _paso_bytes(self):
+        fuente, n = self.texto, self.n
+        c, siguiente = _caracter_utf8(fuente, self.i)
+        if c.isspace():
+            self.i = siguiente
+            return
+        inicio = self.i
+        if c.isdigit() or c == "-":
+            j = _saltar_digitos(fuente, siguiente)
+            if j < n and fuente[j] == 0x2e:
+                j = _saltar_digitos(fuente, j + 1)
+            self.i = j
+            self.emitir(TipoToken.NUMERO, fuente[inicio:j].decode("utf-8"), inicio, j)
+            return
+        self.i = siguiente
+        self.emitir(TipoToken.DESCONOCIDO, c, inicio, siguiente)
+
+    def _paso_afd(self):
+        c = self.texto[self.i]
+        if c.isspace():
+            self.i += 1
+            return
+        inicio = self.i
+        if c.isalpha():
+            j, err = self.i, False
+            while j < self.n and self.texto[j] not in self.delims:
+                if not (self.texto[j].isalnum() or self.texto[j] == '_'):
+                    err = True
+                j += 1
+            lex = self.texto[inicio:j]
+            palabra, fin = (None, None)
+            if not err:
+                palabra, fin = self.trie.buscar(lex, 0)
+                if palabra and fin != len(lex):
+                    palabra = None
+            if palabra:
+                # CONVERTIR PALABRAS A OPERADORES
+                if palabra in OPERADORES_VERBALES:
+                    tipo_token = TipoToken.OPERADOR
+                    valor_token = OPERADORES_VERBALES[palabra]
+                    self.emitir(tipo_token, valor_token, inicio, j)
+                else:
+                    tipo = TOKEN_CATEGORIES[lex]
+                    self.emitir(tipo, lex, inicio, j)
+            else:
+                tp = TipoToken.IDENTIFICADOR if not err else TipoToken.DESCONOCIDO
+                self.emitir(tp, lex, inicio, j)
+            self.i = j
+            return
+        if c == '-' and self.i + 1 < self.n and self.texto[self.i + 1].isdigit():
+            self.i += 1  # Avanzar pasado el signo '-'
+            while self.i < self.n and self.texto[self.i].isdigit():
+                self.i += 1
+            if self.i < self.n and self.texto[self.i] == '.':
+                self.i += 1
                 while self.i < self.n and self.texto[self.i].isdigit():
                     self.i += 1
-                if self.i < self.n and self.texto[self.i] == '.':
-                    self.i += 1
-                    while self.i < self.n and self.texto[self.i].isdigit():
-                        self.i += 1
-                val = self.texto[inicio:self.i]
-                self.emitir(TipoToken.NUMERO, val, inicio, self.i)
-                continue
-            if c == '"':
+            val = self.texto[inicio:self.i]
+            self.emitir(TipoToken.NUMERO, val, inicio, self.i)
+            return
+        if c.isdigit():
+            while self.i < self.n and self.texto[self.i].isdigit():
                 self.i += 1
-                closed = False
-                while self.i < self.n:
-                    if self.texto[self.i] == '"':
-                        closed = True
-                        self.i += 1
-                        break
+            if self.i < self.n and self.texto[self.i] == '.':
+                self.i += 1
+                while self.i < self.n and self.texto[self.i].isdigit():
                     self.i += 1
-                lex = self.texto[inicio:self.i]
-                tp = TipoToken.TEXTO if closed else TipoToken.DESCONOCIDO
-                self.emitir(tp, lex, inicio, self.i)
-                continue
-            if c == '#':
-                while self.i < self.n and self.texto[self.i] != '\n':
+            val = self.texto[inicio:self.i]
+            self.emitir(TipoToken.NUMERO, val, inicio, self.i)
+            return
+        if c == '"':
+            self.i += 1
+            closed = False
+            while self.i < self.n:
+                if self.texto[self.i] == '"':
+                    closed = True
                     self.i += 1
-                lex = self.texto[inicio:self.i]
-                self.emitir(TipoToken.COMENTARIO, lex, inicio, self.i)
-                continue
-            two = self.texto[self.i:self.i+2]
-            if two in CODIGOS_TOKEN_OPERADORES:
-                self.i += 2
-                self.emitir(TipoToken.OPERADOR, two, inicio, self.i)
-                continue
-            if c in CODIGOS_TOKEN_OPERADORES:
+                    break
                 self.i += 1
-                self.emitir(TipoToken.OPERADOR, c, inicio, self.i)
-                continue
-            if c in CODIGOS_TOKEN_LLAVES:
+            lex = self.texto[inicio:self.i]
+            tp = TipoToken.TEXTO if closed else TipoToken.DESCONOCIDO
+            self.emitir(tp, lex, inicio, self.i)
+            return
+        if c == '#':
+            while self.i < self.n and self.texto[self.i] != '\n':
                 self.i += 1
-                self.emitir(TipoToken.LLAVE, c, inicio, self.i)
-                continue
-            if c in CODIGOS_TOKEN_PAR_CORCHETE:
-                self.i += 1
-                self.emitir(TipoToken.PAR_CORCHETE, c, inicio, self.i)
-                continue
-            if c in CODIGOS_TOKEN_PUNTUACION:
-                self.i += 1
-                self.emitir(TipoToken.PUNTUACION, c, inicio, self.i)
-                continue
+            lex = self.texto[inicio:self.i]
+            self.emitir(TipoToken.COMENTARIO, lex, inicio, self.i)
+            return
+        two = self.texto[self.i:self.i+2]
+        if two in CODIGOS_TOKEN_OPERADORES:
+            self.i += 2
+            self.emitir(TipoToken.OPERADOR, two, inicio, self.i)
+            return
+        if c in CODIGOS_TOKEN_OPERADORES:
+            self.i += 1
+            self.emitir(TipoToken.OPERADOR, c, inicio, self.i)
+            return
+        if c in CODIGOS_TOKEN_LLAVES:
+            self.i += 1
+            self.emitir(TipoToken.LLAVE, c, inicio, self.i)
+            return
+        if c in CODIGOS_TOKEN_PAR_CORCHETE:
             self.i += 1
-            self.emitir(TipoToken.DESCONOCIDO, c, inicio, self.i)
-        return self.tokens
\ No newline at end of file
+            self.emitir(TipoToken.PAR_CORCHETE, c, inicio, self.i)
+            return
+        if c in CODIGOS_TOKEN_PUNTUACION:
+            self.i += 1
+            self.emitir(TipoToken.PUNTUACION, c, inicio, self.i)
+            return
+        self.i += 1
+        self.emitir(TipoToken.DESCONOCIDO, c, inicio, self.i)
+
+# Carácter UTF-8 que empieza en fuente[i] y posición del siguiente
+def _caracter_utf8(fuente, i):
+    b = fuente[i]
+    largo = 1 if b < 0x80 else 2 if b < 0xe0 else 3 if b < 0xf0 else 4
+    return fuente[i:i + largo].decode("utf-8"), i + largo
+
+def _saltar_digitos(fuente, i):
+    n = len(fuente)
+    while i < n:
+        b = fuente[i]
+        if 0x30 <= b <= 0x39:
+            i += 1
+        elif b >= 0x80 and _caracter_utf8(fuente, i)[0].isdigit():
+            i = _caracter_utf8(fuente, i)[1]
+        else:
+            break
+    return i
+
+def _token_crudo(tipo, valor, inicio, fin):
+    return (tipo, valor, inicio, fin)
+
+# Genera los tokens de un archivo leyendo por trozos, con offsets absolutos.
+# Los tokens que tocan el final del trozo actual pueden continuar en el
+# siguiente (cadenas, comentarios, '->', '<=', números negativos...), así que se
+# retienen y se vuelven a analizar junto con el siguiente trozo.
+def iter_tokens(fileobj, chunk_size=1 << 16, modo="regex", contexto=None):
+    if contexto is None:
+        contexto = CompilationContext()
+    decodificador = None
+    buffer, base = "", 0
+    fin_archivo = False
+    while not fin_archivo:
+        trozo = fileobj.read(chunk_size)
+        fin_archivo = not trozo
+        if isinstance(trozo, bytes):
+            if decodificador is None:
+                decodificador = codecs.getincrementaldecoder("utf-8")()
+            trozo = decodificador.decode(trozo, final=fin_archivo)
+        buffer += trozo
+        lexico = AFD_Lexico(buffer, modo)
+        lexico.fabrica = _token_crudo
+        consumido = len(buffer)
+        for tipo, valor, inicio, fin in lexico.run():
+            if not fin_archivo and fin >= len(buffer):
+                consumido = inicio
+                break
+            yield Token(tipo, valor, base + inicio, base + fin, contexto)
+        buffer = buffer[consumido:]
+        base += consumido
+
+# Posiciones donde puede partirse el texto en `partes` fragmentos de tamaño
+# parecido: justo después de un ';' o salto de línea que no esté dentro de una
+# cadena ni de un comentario. Ahí siempre termina un token, y ninguna regla
+# del AFD mira más allá de esos caracteres.
+def _puntos_de_corte(texto, partes):
+    n = len(texto)
+    cortes = [0]
+    pos = 0
+    for k in range(1, partes):
+        objetivo = max(n * k // partes, pos)
+        pos = _PATRON_SIN_CORTAR.match(texto, pos, objetivo).end()
+        if pos < objetivo:
+            # Una cadena o comentario cruza el objetivo: se salta entero
+            pos = _PATRON_OPACO.match(texto, pos).end()
+        m = _PATRON_CORTE.search(texto, pos)
+        while m and m.group() not in (";", "\n"):
+            m = _PATRON_CORTE.search(texto, m.end())
+        if m is None:
+            break
+        pos = m.end()
+        cortes.append(pos)
+    if cortes[-1] != n:
+        cortes.append(n)
+    return cortes
+
+# Se ejecuta en los procesos auxiliares; devuelve sólo columnas de enteros
+# (tipo, inicio, fin) porque el lexema se recupera del texto en el proceso principal.
+def _lexar_fragmento(texto, modo):
+    lexico = AFD_Lexico(texto, modo)
+    lexico.fabrica = _token_crudo
+    tipos, inicios, fines = array("i"), array("l"), array("l")
+    for tipo, valor, inicio, fin in lexico.run():
+        tipos.append(tipo.value)
+        inicios.append(inicio)
+        fines.append(fin)
+    return tipos, inicios, fines
+
+# Analiza un archivo repartiendo fragmentos entre `workers` procesos. Los
+# tokens se unen en orden con offsets absolutos y los códigos se asignan en
+# el proceso principal con un único contexto, de modo que el resultado es el
+# mismo que AFD_Lexico(texto, modo).run() sobre el archivo completo.
+def lex_parallel(path, workers=None, modo="regex", contexto=None):
+    with open(path, encoding="utf-8", newline="") as f:
+        texto = f.read()
+    if contexto is None:
+        contexto = CompilationContext()
+    cortes = _puntos_de_corte(texto, workers or os.cpu_count() or 1)
+    if len(cortes) <= 2:
+        return AFD_Lexico(texto, modo, contexto).run()
+    tokens = []
+    agregar = tokens.append
+    tipos_por_valor, verbales = {t.value: t for t in TipoToken}, OPERADORES_VERBALES
+    fragmentos = (texto[a:b] for a, b in zip(cortes, cortes[1:]))
+    with ProcessPoolExecutor(len(cortes) - 1) as ejecutor:
+        for base, (tipos, inicios, fines) in zip(cortes, ejecutor.map(_lexar_fragmento, fragmentos, repeat(modo))):
+            for tipo, inicio, fin in zip(tipos, inicios, fines):
+                tipo = tipos_por_valor[tipo]
+                inicio, fin = inicio + base, fin + base
+                valor = texto[inicio:fin]
+                if tipo == TipoToken.OPERADOR and valor in verbales:
+                    valor = verbales[valor]
+                agregar(Token(tipo, valor, inicio, fin, contexto))
+    return tokens
+
+# Devuelve la edición mínima (offset, eliminado, insertado) que transforma
+# `anterior` en `nuevo`, comparando por bloques el prefijo y el sufijo comunes.
+def calcular_edicion(anterior, nuevo, bloque=4096):
+    n = min(len(anterior), len(nuevo))
+    i = 0
+    while i < n and anterior[i:i + bloque] == nuevo[i:i + bloque]:
+        i += bloque
+    i = min(i, n)
+    while i < n and anterior[i] == nuevo[i]:
+        i += 1
+    # Sufijo común, sin solaparse con el prefijo
+    m, a, b = n - i, len(anterior), len(nuevo)
+    j = 0
+    while j + bloque <= m and anterior[a - j - bloque:a - j] == nuevo[b - j - bloque:b - j]:
+        j += bloque
+    while j < m and anterior[a - j - 1] == nuevo[b - j - 1]:
+        j += 1
+    return i, a - i - j, nuevo[i:b - j]
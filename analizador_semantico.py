@@ -1,58 +1,124 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from mcl_tokens import *
 from simbolos import *
+from ast_nodos import BinOp, Visitante
+from analizador_sintactico import Parser
 
-class AnalizadorSemantico:
-    def __init__(self, ast, tabla_simbolos):
+# `tipos` son los tipos anotados por un Parser con anotar=True; las
+# expresiones con un tipo estable ahí no se vuelven a inferir. Se verifica
+# sobre una vista de la tabla (ver TablaSimbolos.vista), así que lo que
+# cambia 'mezclar' no queda en la tabla del parser.
+class AnalizadorSemantico(Visitante):
+    prefijos = ("verificar_", "tipo_")
+
+    def __init__(self, ast, tabla_simbolos, contexto=None, tipos=None):
         self.ast = ast
-        self.tabla_simbolos = tabla_simbolos
+        self.tabla_simbolos = TablaSimbolos.vista(tabla_simbolos)
+        self.contexto = CompilationContext() if contexto is None else contexto
+        self.tipos = tipos
         self.errores = []
 
-    def analizar(self):
-        self._recorrer_ast(self.ast)
+    # Cada sentencia de primer nivel en orden (o la sentencia `ast`, si no es
+    # un programa). Los cuerpos de 'reaccionar' no dependen unos de otros (ver
+    # _verificar), así que con `procesos` > 1 (None: uno por núcleo) se
+    # reparten entre procesos, con los mismos errores y en el mismo orden.
+    # Abrir los procesos cuesta lo que verificar unos cientos de cuerpos:
+    # con menos de REACCIONES_POR_PROCESO reacciones por proceso se usan
+    # menos procesos, o ninguno.
+    def analizar(self, procesos=1):
+        sentencias = self.ast[1] if self.ast[0] == "PROGRAM" else (self.ast,)
+        reacciones = [i for i, sentencia in enumerate(sentencias) if sentencia[0] == "DEF_REACCION"]
+        procesos = min(procesos or os.cpu_count() or 1, len(reacciones) // REACCIONES_POR_PROCESO)
+        if procesos <= 1:
+            errores = []
+            for sentencia in sentencias:
+                errores += self.verificar_sentencia(sentencia)
+            self.errores = errores
+            return errores
+        # Cada cuerpo se verifica sobre una bifurcación de la tabla tomada en
+        # su sentencia, como si se verificara en ese momento
+        por_sentencia, cuerpos = [], []
+        for sentencia in sentencias:
+            self.errores = []
+            self._recorrer_ast(sentencia)
+            por_sentencia.append(self.errores)
+            if sentencia[0] == "DEF_REACCION":
+                cuerpos.append((sentencia, self.tabla_simbolos.bifurcar()))
+        for i, errores in zip(reacciones, _verificar_cuerpos_en_procesos(cuerpos, self.contexto, procesos)):
+            por_sentencia[i] += errores
+        self.errores = [error for errores in por_sentencia for error in errores]
+        return self.errores
+
+    # Errores de una sentencia de primer nivel, con la tabla como la dejaron
+    # las anteriores. Es lo que repiten analizar() y SemanticoIncremental.
+    def verificar_sentencia(self, sentencia):
+        self.errores = []
+        self._verificar(sentencia)
         return self.errores
 
-    def _recorrer_ast(self, nodo):
-        if isinstance(nodo, tuple):
-            tipo = nodo[0]
-            if tipo == "SUSTANCIA":
-                self._verificar_sustancia(nodo)
-            elif tipo == "NUMERO":
-                self._verificar_numero(nodo)
-            elif tipo == "CADENA":
-                self._verificar_cadena(nodo)
-            elif tipo == "ASIGNACION":
-                self._verificar_asignacion(nodo)
-            elif tipo == "DEF_REACCION":
-                self._verificar_reaccion(nodo)
-            elif tipo == "CALL":
-                self._verificar_llamada(nodo)
-            elif tipo == "MEZCLAR":
-                self._verificar_mezclar(nodo)
-            elif tipo == "BALANCEAR":
-                self._verificar_balancear(nodo)
-            elif tipo == "MOSTRAR":
-                self._verificar_mostrar(nodo)
-            elif tipo in ("SI", "REPETIR_HASTA", "HACER_MIENTRAS"):
-                self._verificar_control(nodo)
-
-            # Recorrer hijos
-            for elemento in nodo[1:]:
-                self._recorrer_ast(elemento)
+    # La sentencia y, si es una definición 'reaccionar', su cuerpo. El cuerpo
+    # se verifica en una vista aparte de la tabla, así que lo que declara o
+    # cambia no llega a las sentencias siguientes. La tabla es la del parser
+    # con todos los globales, también los declarados más adelante, pero el
+    # parser ya rechaza un cuerpo (o cualquier sentencia) que use un nombre
+    # antes de su declaración.
+    def _verificar(self, sentencia):
+        self._recorrer_ast(sentencia)
+        if sentencia[0] == "DEF_REACCION":
+            self.errores += _verificar_cuerpo_aislado(sentencia, self.tabla_simbolos, self.contexto, self.tipos)
+
+    # Preorden con una pila explícita: las expresiones pueden ser más
+    # profundas que el límite de recursión
+    def _recorrer_ast(self, raiz):
+        pila = [raiz]
+        while pila:
+            nodo = pila.pop()
+            if isinstance(nodo, tuple):
+                metodo = self.metodo_para(self.tabla_verificar, nodo)
+                if metodo is not None:
+                    metodo(self, nodo)
+
+                # Recorrer hijos
+                pila.extend(reversed(nodo[1:]))
+
+    # Cuerpo de una definición 'reaccionar', verificado como un programa: los
+    # reactivos y productos son sustancias de un ámbito propio y cada
+    # declaración del cuerpo se inserta antes de verificarla, como en el
+    # parser. Igual que en el primer nivel, no se entra en los bloques de
+    # 'si' y 'repetir'.
+    def _verificar_cuerpo(self, nodo):
+        _, _, reactivos, productos, cuerpo = nodo
+        self.tabla_simbolos.entrar_bloque()
+        for _, param in reactivos + productos:
+            self.tabla_simbolos.insertar(param, SimboloSustancia(param))
+        self.tabla_simbolos.entrar_bloque()
+        for sentencia in cuerpo[1]:
+            etiqueta = sentencia[0]
+            if etiqueta == "SUSTANCIA":
+                self.tabla_simbolos.insertar(sentencia[1], SimboloSustancia(*sentencia[1:]))
+            elif etiqueta == "NUMERO":
+                self.tabla_simbolos.insertar(sentencia[1], SimboloNumero(*sentencia[1:]))
+            elif etiqueta == "CADENA":
+                self.tabla_simbolos.insertar(sentencia[1], SimboloCadena(*sentencia[1:]))
+            elif etiqueta == "DEF_REACCION":
+                self.tabla_simbolos.insertar(sentencia[1], SimboloReaccion(sentencia[1], sentencia[2], sentencia[3]))
+            self._verificar(sentencia)
+        self.tabla_simbolos.salir_bloque()
+        self.tabla_simbolos.salir_bloque()
 
     def _verificar_sustancia(self, nodo):
         _, name, qty, unit, meta = nodo
-        try:
-            float(qty)
-        except ValueError:
+        if self.contexto.constante(qty).flotante is None:
             self.errores.append(f"Cantidad '{qty}' no es un número válido")
 
         if unit and unit not in CODIGOS_TOKEN_UNIDADES:
             self.errores.append(f"Unidad '{unit}' no reconocida")
 
         for v, u in meta:
-            try:
-                float(v)
-            except ValueError:
+            if self.contexto.constante(v).flotante is None:
                 self.errores.append(f"Metadato '{v}' no es un número válido")
             if u not in ["gradC", "atm"]:
                 self.errores.append(f"Unidad de metadato '{u}' no válida")
@@ -88,8 +154,8 @@ class AnalizadorSemantico:
             if prop == "cant":
                 if expr_type != "numero":
                     self.errores.append(f"Asignación a '{var}.cant' debe ser numérica, no {expr_type}")
-                if simbolo.info.get("unidad") and expr_unit and simbolo.info["unidad"] != expr_unit:
-                    self.errores.append(f"Incompatibilidad de unidades: '{var}' usa {simbolo.info['unidad']}, expresión usa {expr_unit}")
+                if simbolo.unidad and expr_unit and simbolo.unidad != expr_unit:
+                    self.errores.append(f"Incompatibilidad de unidades: '{var}' usa {simbolo.unidad}, expresión usa {expr_unit}")
             elif prop in ["temp", "presion"]:
                 if expr_type != "numero":
                     self.errores.append(f"Asignación a '{var}.{prop}' debe ser numérica, no {expr_type}")
@@ -97,13 +163,8 @@ class AnalizadorSemantico:
                 if expr_unit != expected_unit:
                     self.errores.append(f"Incompatibilidad de unidades: '{prop}' requiere {expected_unit}, expresión usa {expr_unit}")
                 # Verify if the property exists in metadatos or add it
-                meta = simbolo.info.get("metadatos", [])
-                found = False
-                for v, u in meta:
-                    if (prop == "temp" and u == "gradC") or (prop == "presion" and u == "atm"):
-                        found = True
-                        break
-                if not found:
+                valor = simbolo.temp if prop == "temp" else simbolo.presion
+                if valor is None:
                     self.errores.append(f"Propiedad '{prop}' no definida para la sustancia '{var}'")
             else:
                 self.errores.append(f"Propiedad desconocida '{prop}' para la sustancia '{var}'")
@@ -116,8 +177,8 @@ class AnalizadorSemantico:
             expr_type, expr_unit = self._infer_type(expr)
             if expr_type != simbolo.tipo:
                 self.errores.append(f"Tipo incompatible en asignación: {name} es {simbolo.tipo}, expresión es {expr_type}")
-            if simbolo.tipo == "sustancia" and simbolo.info.get("unidad") and expr_unit and simbolo.info["unidad"] != expr_unit:
-                self.errores.append(f"Incompatibilidad de unidades: {name} usa {simbolo.info['unidad']}, expresión usa {expr_unit}")
+            if simbolo.tipo == "sustancia" and simbolo.unidad and expr_unit and simbolo.unidad != expr_unit:
+                self.errores.append(f"Incompatibilidad de unidades: {name} usa {simbolo.unidad}, expresión usa {expr_unit}")
 
     def _verificar_reaccion(self, nodo):
         _, name, reactivos, productos, _ = nodo
@@ -138,7 +199,8 @@ class AnalizadorSemantico:
             self.errores.append(f"Reacción '{name}' espera {len(expected)} argumentos, se proporcionaron {len(args)}")
 
     def _verificar_mezclar(self, nodo):
-        _, expr, tgt = nodo
+        _, expr, tgt_node = nodo
+        tgt = tgt_node[1]  # Nombre del destino en el nodo SUSTANCIA implícito
         expr_type, expr_unit = self._infer_type(expr)
         if expr_type != "sustancia":
             self.errores.append(f"Expresión en 'mezclar' debe ser sustancia, no {expr_type}")
@@ -146,13 +208,13 @@ class AnalizadorSemantico:
         # Check or create symbol for target
         simbolo = self.tabla_simbolos.buscar(tgt)
         if not simbolo:
-            simbolo = Simbolo(tgt, "sustancia", cantidad="0", unidad=None, metadatos=[])
+            simbolo = SimboloSustancia(tgt, "0", None, [])
             self.tabla_simbolos.insertar(tgt, simbolo)
         elif simbolo.tipo != "sustancia":
             self.errores.append(f"Destino '{tgt}' no es una sustancia válida")
             return
-        elif simbolo.info.get("unidad") and expr_unit and simbolo.info["unidad"] != expr_unit:
-            self.errores.append(f"Incompatibilidad de unidades en 'mezclar': destino usa {simbolo.info['unidad']}, expresión usa {expr_unit}")
+        elif simbolo.unidad and expr_unit and simbolo.unidad != expr_unit:
+            self.errores.append(f"Incompatibilidad de unidades en 'mezclar': destino usa {simbolo.unidad}, expresión usa {expr_unit}")
 
         # Propagar metadatos comunes al símbolo destino
         if isinstance(expr, tuple) and expr[0] == "BIN_OP" and expr[1] == "+":
@@ -162,13 +224,13 @@ class AnalizadorSemantico:
                 right_sim = self.tabla_simbolos.buscar(right[1])
                 if left_sim and right_sim:
                     # Convertir metadatos a diccionarios {unidad: valor}
-                    left_meta = dict((u, v) for v, u in left_sim.info.get("metadatos", []))
-                    right_meta = dict((u, v) for v, u in right_sim.info.get("metadatos", []))
+                    left_meta = dict((u, v) for v, u in left_sim.metadatos or ())
+                    right_meta = dict((u, v) for v, u in right_sim.metadatos or ())
                     # Unidades comunes entre ambas sustancias
                     unidades_comunes = set(left_meta.keys()) & set(right_meta.keys())
                     # Crear metadatos dummy con valor "0" para evitar errores semánticos
                     nuevos_meta = [("0", u) for u in unidades_comunes]
-                    simbolo.info["metadatos"] = nuevos_meta
+                    self.tabla_simbolos.modificable(tgt).metadatos = nuevos_meta
 
 
 
@@ -198,58 +260,239 @@ class AnalizadorSemantico:
         if cond_type != "booleano":
             self.errores.append(f"Condición en '{tipo}' debe ser booleana, no {cond_type}")
 
+    # Verificación por clase de nodo (ver Visitante)
+    verificar_Sustancia = _verificar_sustancia
+    verificar_Numero = _verificar_numero
+    verificar_Cadena = _verificar_cadena
+    verificar_Asignacion = _verificar_asignacion
+    verificar_DefReaccion = _verificar_reaccion
+    verificar_Llamada = _verificar_llamada
+    verificar_Mezclar = _verificar_mezclar
+    verificar_Balancear = _verificar_balancear
+    verificar_Mostrar = _verificar_mostrar
+    verificar_Si = verificar_RepetirHasta = verificar_HacerMientras = _verificar_control
+
     def _infer_type(self, node):
-        if isinstance(node, tuple):
-            if node[0] == "VAR":
-                simbolo = self.tabla_simbolos.buscar(node[1])
-                if not simbolo:
-                    return "desconocido", None
-                return simbolo.tipo, simbolo.info.get("unidad")
-            elif node[0] == "PROP_ACCESS":
-                var, prop = node[1], node[2]
-                simbolo = self.tabla_simbolos.buscar(var)
-                if not simbolo or simbolo.tipo != "sustancia":
-                    self.errores.append(f"'{var}' debe ser una sustancia para acceder a la propiedad '{prop}'")
-                    return "desconocido", None
-                if prop == "cant":
-                    return "numero", simbolo.info.get("unidad")
-                elif prop in ["temp", "presion"]:
-                    for v, u in simbolo.info.get("metadatos", []):
-                        if (prop == "temp" and u == "gradC") or (prop == "presion" and u == "atm"):
-                            return "numero", u
-                    self.errores.append(f"Propiedad '{prop}' no definida para la sustancia '{var}'")
-                    return "desconocido", None
-                else:
-                    self.errores.append(f"Propiedad desconocida '{prop}' para la sustancia '{var}'")
-                    return "desconocido", None
-            elif node[0] == "NUM":
-                return "numero", None
-            elif node[0] == "TEXT":
+        if self.tipos is not None:
+            entrada = self.tipos.get(id(node))
+            if entrada is not None and entrada[0] is node and entrada[3]:
+                return entrada[1], entrada[2]
+        return self.reducir(self.tabla_tipo, BinOp, node, ("desconocido", None))
+
+    def tipo_Var(self, node):
+        simbolo = self.tabla_simbolos.buscar(node[1])
+        if not simbolo:
+            return "desconocido", None
+        return simbolo.tipo, simbolo.unidad
+
+    def tipo_AccesoPropiedad(self, node):
+        var, prop = node[1], node[2]
+        simbolo = self.tabla_simbolos.buscar(var)
+        if not simbolo or simbolo.tipo != "sustancia":
+            self.errores.append(f"'{var}' debe ser una sustancia para acceder a la propiedad '{prop}'")
+            return "desconocido", None
+        if prop == "cant":
+            return "numero", simbolo.unidad
+        elif prop in ["temp", "presion"]:
+            if prop == "temp" and simbolo.temp is not None:
+                return "numero", "gradC"
+            if prop == "presion" and simbolo.presion is not None:
+                return "numero", "atm"
+            self.errores.append(f"Propiedad '{prop}' no definida para la sustancia '{var}'")
+            return "desconocido", None
+        else:
+            self.errores.append(f"Propiedad desconocida '{prop}' para la sustancia '{var}'")
+            return "desconocido", None
+
+    def tipo_Num(self, node):
+        return "numero", None
+
+    def tipo_Texto(self, node):
+        return "cadena", None
+
+    def tipo_BinOp(self, node, left, right):
+        op = node[1]
+        left_type, left_unit = left
+        right_type, right_unit = right
+        if op in ["+", "-"]:
+            if left_type == right_type == "sustancia":
+                if left_unit != right_unit:
+                    self.errores.append(f"Incompatibilidad de unidades: {left_unit} y {right_unit}")
+                return "sustancia", left_unit
+            elif left_type == right_type == "cadena" and op == "+":
                 return "cadena", None
-            elif node[0] == "BIN_OP":
-                op, left, right = node[1], node[2], node[3]
-                left_type, left_unit = self._infer_type(left)
-                right_type, right_unit = self._infer_type(right)
-                if op in ["+", "-"]:
-                    if left_type == right_type == "sustancia":
-                        if left_unit != right_unit:
-                            self.errores.append(f"Incompatibilidad de unidades: {left_unit} y {right_unit}")
-                        return "sustancia", left_unit
-                    elif left_type == right_type == "cadena" and op == "+":
-                        return "cadena", None
-                    elif left_type == right_type == "numero":
-                        return "numero", None
-                    else:
-                        self.errores.append(f"Operador '{op}' no válido entre tipos {left_type} y {right_type}")
-                elif op in ["*", "/"]:
-                    if left_type == "sustancia" and right_type == "numero":
-                        return "sustancia", left_unit
-                    elif left_type == right_type == "numero":
-                        return "numero", None
-                    else:
-                        self.errores.append(f"Operador '{op}' no válido entre tipos {left_type} y {right_type}")
-            elif node[0] == "COND":
-                return "booleano", None
-            elif node[0] == "LOGIC":
-                return "booleano", None
-        return "desconocido", None
\ No newline at end of file
+            elif left_type == right_type == "numero":
+                return "numero", None
+            else:
+                self.errores.append(f"Operador '{op}' no válido entre tipos {left_type} y {right_type}")
+        elif op in ["*", "/"]:
+            if left_type == "sustancia" and right_type == "numero":
+                return "sustancia", left_unit
+            elif left_type == right_type == "numero":
+                return "numero", None
+            else:
+                self.errores.append(f"Operador '{op}' no válido entre tipos {left_type} y {right_type}")
+        return "desconocido", None
+
+    def tipo_Condicion(self, node):
+        return "booleano", None
+
+    tipo_Logica = tipo_Condicion
+
+# Ver AnalizadorSemantico.analizar
+REACCIONES_POR_PROCESO = 500
+
+# Errores del cuerpo de `reaccion` verificado sobre `tabla`, que no cambia
+def _verificar_cuerpo_aislado(reaccion, tabla, contexto, tipos=None):
+    analizador = AnalizadorSemantico(reaccion, tabla, contexto, tipos)
+    analizador._verificar_cuerpo(reaccion)
+    return analizador.errores
+
+# Errores de cada par (reacción, tabla) de `cuerpos`, en orden. Las tareas
+# son sólo tramos de índices: los pares llegan a los procesos una sola vez al
+# arrancar (con fork, sin copiarlos), porque pasar los nodos cuesta más que
+# verificarlos. Los tipos del parser van por id de nodo y no sirven en otro
+# proceso; como sólo se reutilizan los que dan el mismo resultado que
+# inferirlos, no cambia nada.
+def _verificar_cuerpos_en_procesos(cuerpos, contexto, procesos):
+    paso = -(-len(cuerpos) // (4 * procesos))
+    with ProcessPoolExecutor(procesos, initializer=_iniciar_proceso, initargs=(cuerpos, contexto)) as ejecutor:
+        tramos = ejecutor.map(_verificar_tramo, range(0, len(cuerpos), paso), repeat(paso))
+        return [errores for tramo in tramos for errores in tramo]
+
+_estado_proceso = None
+
+def _iniciar_proceso(cuerpos, contexto):
+    global _estado_proceso
+    _estado_proceso = cuerpos, contexto
+
+def _verificar_tramo(inicio, largo):
+    cuerpos, contexto = _estado_proceso
+    return [_verificar_cuerpo_aislado(reaccion, tabla, contexto) for reaccion, tabla in cuerpos[inicio:inicio + largo]]
+
+# Lo que una sentencia de primer nivel lee y define para el semántico, con
+# sus errores del último análisis. Las lecturas son todos los textos del
+# subárbol (de más no cambia el resultado, sólo se reverifica de más).
+class _DependenciasSentencia:
+    __slots__ = ("nodo", "lecturas", "definiciones", "errores")
+
+    def __init__(self, nodo):
+        self.nodo = nodo
+        self.lecturas = lecturas = set()
+        pila = [nodo]
+        while pila:
+            valor = pila.pop()
+            if isinstance(valor, str):
+                lecturas.add(valor)
+            elif isinstance(valor, (tuple, list)):
+                pila.extend(valor)
+        etiqueta = nodo[0] if isinstance(nodo, tuple) and nodo else None
+        if etiqueta in ("SUSTANCIA", "NUMERO", "CADENA", "DEF_REACCION"):
+            self.definiciones = (nodo[1],)
+        elif etiqueta == "MEZCLAR":
+            self.definiciones = (nodo[2][1],)
+        else:
+            self.definiciones = ()
+        self.errores = None
+
+    # 'mezclar' agrega y modifica símbolos de la tabla al verificarse
+    @property
+    def modifica_tabla(self):
+        return bool(self.definiciones) and self.nodo[0] == "MEZCLAR"
+
+# El mismo análisis que AnalizadorSemantico.analizar() (con todas las
+# sentencias nuevas, verifica cada una igual y en el mismo orden), pero entre
+# un análisis y el siguiente reverifica sólo lo que puede haber cambiado. Las
+# sentencias se reconocen por identidad del nodo, como las que reutiliza
+# ParserIncremental; las nuevas, las de `cambiadas` (índices en el programa)
+# y las que ya no están cambian los nombres que definen, y se reverifica toda
+# sentencia que lea un nombre cambiado, con lo que define, hasta no quedar
+# nombres nuevos. Como 'mezclar' modifica la
+# tabla al verificarse, también se repiten (en orden) los que definen un
+# nombre que lee alguna de esas sentencias o alguno de los 'mezclar'
+# repetidos. El resto conserva sus errores del análisis anterior.
+class SemanticoIncremental:
+    def __init__(self, contexto=None):
+        self.contexto = CompilationContext() if contexto is None else contexto
+        self.dependencias = {}
+        # Sentencias verificadas en el último análisis
+        self.verificadas = 0
+
+    def analizar(self, ast, tabla_simbolos, cambiadas=()):
+        analizador = AnalizadorSemantico(ast, tabla_simbolos, self.contexto)
+        previas, registros, cambiados = self.dependencias, [], set()
+        for i, nodo in enumerate(ast[1]):
+            registro = previas.pop(id(nodo), None)
+            if registro is None or registro.nodo is not nodo or i in cambiadas:
+                registro = _DependenciasSentencia(nodo)
+                cambiados.update(registro.definiciones)
+            registros.append(registro)
+        for registro in previas.values():
+            cambiados.update(registro.definiciones)
+
+        lectores = {}
+        for registro in registros:
+            for nombre in registro.lecturas:
+                lectores.setdefault(nombre, []).append(registro)
+        pendientes = list(cambiados)
+        while pendientes:
+            for registro in lectores.get(pendientes.pop(), ()):
+                if registro.errores is not None:
+                    registro.errores = None
+                    for nombre in registro.definiciones:
+                        if nombre not in cambiados:
+                            cambiados.add(nombre)
+                            pendientes.append(nombre)
+
+        modificadores = {}
+        for registro in registros:
+            if registro.modifica_tabla:
+                modificadores.setdefault(registro.definiciones[0], []).append(registro)
+        repetidos, pendientes = set(), [registro for registro in registros if registro.errores is None]
+        while pendientes:
+            for nombre in pendientes.pop().lecturas:
+                if nombre in modificadores and nombre not in repetidos:
+                    repetidos.add(nombre)
+                    pendientes.extend(modificadores[nombre])
+
+        self.verificadas, errores = 0, []
+        for registro in registros:
+            if registro.errores is None or (registro.modifica_tabla and registro.definiciones[0] in repetidos):
+                registro.errores = analizador.verificar_sentencia(registro.nodo)
+                self.verificadas += 1
+            errores += registro.errores
+        self.dependencias = {id(registro.nodo): registro for registro in registros}
+        return errores
+
+# Resultado de validar(): el AST, la tabla de símbolos, los errores del
+# parser y del semántico en una sola lista, los tipos anotados por el parser,
+# el índice de referencias y los segundos de cada fase
+class Validacion:
+    __slots__ = ("ast", "tabla_simbolos", "errores", "tipos", "referencias", "tiempos")
+
+    def __init__(self, ast, tabla_simbolos, errores, tipos, referencias, tiempos):
+        self.ast = ast
+        self.tabla_simbolos = tabla_simbolos
+        self.errores = errores
+        self.tipos = tipos
+        self.referencias = referencias
+        self.tiempos = tiempos
+
+# Análisis en una sola pasada sobre los tokens: el parser verifica tipos y
+# unidades de cada sentencia mientras la arma y deja anotados los de cada
+# expresión, que el semántico toma sin volver a inferirlos (sólo los
+# estables, ver Parser._infer_type). Con semantica=False no se corre el
+# semántico, que repite verificaciones que el parser ya hizo; `procesos` es
+# el de AnalizadorSemantico.analizar.
+def validar(tokens, tabla_simbolos, contexto=None, mapa=None, recuperar=False, semantica=True, procesos=1):
+    tiempos = {}
+    inicio = time.perf_counter()
+    parser = Parser(tokens, tabla_simbolos, contexto, mapa, recuperar=recuperar, anotar=True)
+    ast = parser.program()
+    tiempos["sintactico"] = time.perf_counter() - inicio
+    errores = list(parser.errors)
+    if semantica:
+        inicio = time.perf_counter()
+        errores += AnalizadorSemantico(ast, tabla_simbolos, parser.contexto, parser.tipos).analizar(procesos)
+        tiempos["semantico"] = time.perf_counter() - inicio
+    return Validacion(ast, tabla_simbolos, errores, parser.tipos, parser.referencias, tiempos)
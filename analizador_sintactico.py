@@ -1,11 +1,39 @@
+from bisect import bisect_left
 from mcl_tokens import *
 from simbolos import *
+from mapa_fuente import Diagnostico
+from ast_nodos import *
+from referencias import *
 
-class Parser:
-    def __init__(self, tokens, tabla_simbolos):
+# Palabras que inician una sentencia; en modo recuperación son puntos de sincronización
+PALABRAS_SENTENCIA = frozenset(("sustancia", "numero", "cadena", "reaccionar", "balancear",
+                                "mostrar", "mezclar", "repetir", "hacer", "detener", "si"))
+
+# Precedencia de los operadores binarios de las expresiones
+PRECEDENCIA = {"+": 1, "-": 1, "*": 2, "/": 2}
+
+class Parser(Visitante):
+    prefijos = ("tipo_",)
+
+    # Con `mapa` (SourceMap del texto) los errores indican línea y columna.
+    # Con recuperar=True un error de sintaxis no detiene el análisis: se
+    # registra en self.errors, la sentencia se reemplaza por un nodo
+    # ErrorSintaxis(diagnóstico) y se continúa tras el siguiente ';', antes de
+    # un '}' o de una palabra que inicia sentencia. Con anotar=True se
+    # conservan los tipos inferidos de todas las expresiones en self.tipos
+    # para el semántico y el intérprete (ver analizador_semantico.validar).
+    def __init__(self, tokens, tabla_simbolos, contexto=None, mapa=None, recuperar=False, anotar=False):
         self.tokens, self.pos = tokens, 0
+        self.mapa = mapa
+        self.recuperar = recuperar
+        self.anotar = anotar
+        # Tipo y unidad de cada expresión ya inferida: id(nodo) -> (nodo, tipo, unidad, estable)
+        self.tipos = {}
         self.tabla_simbolos = tabla_simbolos
+        self.contexto = CompilationContext() if contexto is None else contexto
         self.errors = []
+        # Declaraciones y usos de cada símbolo (ver ReferenciasCruzadas)
+        self.referencias = ReferenciasCruzadas(tabla_simbolos.tablas[0])
 
     @property
     def look(self):
@@ -21,14 +49,77 @@ class Parser:
             self.error(f"Se esperaba: '{exp}', encontrado: '{got}'")
 
     def error(self, msg):
-        self.errors.append(f"[pos {self.pos}] {msg}")
-        raise SyntaxError(f"[pos {self.pos}] {msg}")
+        if self.pos < len(self.tokens):
+            inicio, fin = self.tokens[self.pos].inicio, self.tokens[self.pos].fin
+        else:
+            inicio = fin = self.tokens[-1].fin if self.tokens else 0
+        diagnostico = Diagnostico(msg, self.pos, inicio, fin, self.mapa)
+        self.errors.append(diagnostico)
+        excepcion = SyntaxError(diagnostico)
+        excepcion.diagnostico = diagnostico
+        raise excepcion
 
     def program(self):
-        stmts = []
-        while self.look.tipo != TipoToken.DESCONOCIDO:
-            stmts.append(self.stmt())
-        return ("PROGRAM", stmts)
+        return Programa(list(self.generar_sentencias()))
+
+    # Sentencias de primer nivel, cada una en cuanto termina de analizarse.
+    # Los tipos inferidos sólo se reutilizan dentro de una sentencia, así que
+    # salvo con anotar=True la caché se vacía entre una y otra y no retiene
+    # las ya entregadas.
+    def generar_sentencias(self):
+        while self.look.tipo != TipoToken.DESCONOCIDO or (self.recuperar and self.pos < len(self.tokens)):
+            yield self._sentencia()
+            if not self.anotar:
+                self.tipos.clear()
+
+    # Como generar_sentencias, junto con copias de los símbolos globales que
+    # declaró cada sentencia, para ejecutarla sin compartir símbolos con el
+    # parser (ver Interprete.ejecutar_en_flujo)
+    def generar_sentencias_con_efectos(self):
+        globales = self.tabla_simbolos.tablas[0]
+        if not isinstance(globales, _GlobalesRegistrados):
+            globales = self.tabla_simbolos.tablas[0] = _GlobalesRegistrados(globales)
+        globales.declarados.clear()
+        for nodo in self.generar_sentencias():
+            yield nodo, _copiar_simbolos({nombre: globales[nombre] for nombre in globales.declarados})
+            globales.declarados.clear()
+
+    def _sentencia(self):
+        if not self.recuperar:
+            return self.stmt()
+        inicio, profundidad = self.pos, self.tabla_simbolos.profundidad
+        try:
+            return self.stmt()
+        except SyntaxError as ex:
+            while self.tabla_simbolos.profundidad > profundidad:
+                self._salir_bloque()
+            self._sincronizar(inicio)
+            return ErrorSintaxis(ex.diagnostico)
+
+    # Los bloques '{ ... }' que se saltan se descartan completos (con su 'sino')
+    def _sincronizar(self, inicio):
+        if self.pos == inicio:
+            self.pos += 1
+        profundidad = 0
+        while self.pos < len(self.tokens):
+            tok = self.tokens[self.pos]
+            if tok.tipo == TipoToken.LLAVE:
+                if tok.valor == "{":
+                    profundidad += 1
+                elif profundidad == 0:
+                    return
+                else:
+                    profundidad -= 1
+                    if profundidad == 0 and self._peek_val() != "sino":
+                        self.pos += 1
+                        return
+            elif profundidad == 0:
+                if tok.tipo == TipoToken.PUNTUACION and tok.valor == ";":
+                    self.pos += 1
+                    return
+                if tok.tipo == TipoToken.PALABRA_RESERVADA and tok.valor in PALABRAS_SENTENCIA:
+                    return
+            self.pos += 1
 
     def stmt(self):
         tp, val = self.look.tipo, self.look.valor
@@ -49,24 +140,23 @@ class Parser:
             return self.cmd_asignacion_or_expr()
         if tp == TipoToken.PUNTUACION and val == ";":
             self.eat(tp, ";")
-            return ("EMPTY",)
+            return Vacia()
         if tp == TipoToken.COMENTARIO:
             txt = val
             self.eat(tp)
-            return ("COMMENT", txt)
+            return Comentario(txt)
         self.error(f"Sentencia inesperada '{val}'")
 
     def cmd_sustancia(self):
+        inicio = self.pos
         self.eat(TipoToken.PALABRA_RESERVADA, "sustancia")
-        name = self.look.valor; self.eat(TipoToken.IDENTIFICADOR)
+        name = self._identificador()
         if self.tabla_simbolos.existe_en_actual(name):
             self.error(f"Identificador '{name}' ya declarado")
         self.eat(TipoToken.PALABRA_RESERVADA, "cantidad")
         self.eat(TipoToken.OPERADOR, "=")
-        qty = self.look.valor; self.eat(TipoToken.NUMERO)
-        try:
-            float(qty)
-        except ValueError:
+        qty = self.contexto.constante(self.look.valor); self.eat(TipoToken.NUMERO)
+        if qty.flotante is None:
             self.error(f"Cantidad '{qty}' no es un número válido")
         unit = None
         if self.look.tipo == TipoToken.UNIDAD:
@@ -76,10 +166,8 @@ class Parser:
             self.eat(TipoToken.OPERADOR, "@")
             self.eat(TipoToken.PAR_CORCHETE, "[")
             while True:
-                v = self.look.valor; self.eat(TipoToken.NUMERO)
-                try:
-                    float(v)
-                except ValueError:
+                v = self.contexto.constante(self.look.valor); self.eat(TipoToken.NUMERO)
+                if v.flotante is None:
                     self.error(f"Metadato '{v}' no es un número válido")
                 u = self.look.valor; self.eat(TipoToken.UNIDAD)
                 if u not in CODIGOS_TOKEN_UNIDADES:
@@ -89,14 +177,15 @@ class Parser:
                 self.eat(TipoToken.PUNTUACION, ",")
             self.eat(TipoToken.PAR_CORCHETE, "]")
         self.eat(TipoToken.PUNTUACION, ";")
-        simbolo = Simbolo(name, "sustancia", cantidad=qty, unidad=unit, metadatos=meta)
+        simbolo = SimboloSustancia(name, qty, unit, meta)
         self.tabla_simbolos.insertar(name, simbolo)
-        return ("SUSTANCIA", name, qty, unit, meta)
+        self.referencias.declarar(name, "sustancia", inicio, self.pos)
+        return Sustancia(name, qty, unit, meta)
 
     def cmd_numero(self):
+        inicio = self.pos
         self.eat(TipoToken.PALABRA_RESERVADA, "numero")
-        name = self.look.valor
-        self.eat(TipoToken.IDENTIFICADOR)
+        name = self._identificador()
         if self.tabla_simbolos.existe_en_actual(name):
             self.error(f"Identificador '{name}' ya declarado")
         self.eat(TipoToken.OPERADOR, "=")
@@ -105,30 +194,35 @@ class Parser:
         if expr_type != "numero":
             self.error(f"La expresión debe ser de tipo número, no {expr_type}")
         self.eat(TipoToken.PUNTUACION, ";")
-        simbolo = Simbolo(name, "numero", valor=value_expr)
+        simbolo = SimboloNumero(name, value_expr)
         self.tabla_simbolos.insertar(name, simbolo)
-        return ("NUMERO", name, value_expr)
+        self.referencias.declarar(name, "numero", inicio, self.pos)
+        return Numero(name, value_expr)
 
     def cmd_cadena(self):
+        inicio = self.pos
         self.eat(TipoToken.PALABRA_RESERVADA, "cadena")
-        name = self.look.valor; self.eat(TipoToken.IDENTIFICADOR)
+        name = self._identificador()
         if self.tabla_simbolos.existe_en_actual(name):
             self.error(f"Identificador '{name}' ya declarado")
         self.eat(TipoToken.OPERADOR, "=")
         value = self.look.valor; self.eat(TipoToken.TEXTO)
         self.eat(TipoToken.PUNTUACION, ";")
-        simbolo = Simbolo(name, "cadena", valor=value)
+        simbolo = SimboloCadena(name, value)
         self.tabla_simbolos.insertar(name, simbolo)
-        return ("CADENA", name, value)
+        self.referencias.declarar(name, "cadena", inicio, self.pos)
+        return Cadena(name, value)
 
     def cmd_asignacion_or_expr(self):
-        name = self.look.valor; self.eat(TipoToken.IDENTIFICADOR)
+        inicio = self.pos
+        name = self._identificador()
         if self.look.valor in (".", "=>"):
             op = self.look.valor
             self.eat(TipoToken.PUNTUACION if op == "." else TipoToken.OPERADOR, op)
             prop = self.look.valor; self.eat(TipoToken.IDENTIFICADOR)
             if self.look.valor == "=":
                 self.eat(TipoToken.OPERADOR, "=")
+                self.referencias.usar(name, inicio, USO_ASIGNACION)
                 expr = self.expr()
                 expr_type, expr_unit = self._infer_type(expr)
                 simbolo = self.tabla_simbolos.buscar(name)
@@ -139,8 +233,8 @@ class Parser:
                 if prop == "cant":
                     if expr_type != "numero":
                         self.error(f"Asignación a 'cant' debe ser de tipo número, no {expr_type}")
-                    if simbolo.info.get("unidad") and expr_unit and simbolo.info["unidad"] != expr_unit:
-                        self.error(f"Incompatibilidad de unidades: '{name}' tiene '{simbolo.info['unidad']}', expresión tiene '{expr_unit}'")
+                    if simbolo.unidad and expr_unit and simbolo.unidad != expr_unit:
+                        self.error(f"Incompatibilidad de unidades: '{name}' tiene '{simbolo.unidad}', expresión tiene '{expr_unit}'")
                 elif prop in ["temp", "presion"]:
                     if expr_type != "numero":
                         self.error(f"Asignación a '{prop}' debe ser de tipo número, no {expr_type}")
@@ -150,9 +244,10 @@ class Parser:
                 else:
                     self.error(f"Propiedad desconocida '{prop}' para la sustancia '{name}'")
                 self.eat(TipoToken.PUNTUACION, ";")
-                return ("ASIGNACION", ("PROP_ACCESS", name, prop), expr)
+                return Asignacion(AccesoPropiedad(name, prop), expr)
         if self.look.valor == "=":
             self.eat(TipoToken.OPERADOR, "=")
+            self.referencias.usar(name, inicio, USO_ASIGNACION)
             expr = self.expr()
             expr_type, expr_unit = self._infer_type(expr)
             simbolo = self.tabla_simbolos.buscar(name)
@@ -160,40 +255,47 @@ class Parser:
                 self.error(f"Variable '{name}' no declarada para asignación")
             if expr_type != simbolo.tipo:
                 self.error(f"Asignación incompatible: '{name}' es de tipo {simbolo.tipo}, pero la expresión es de tipo {expr_type}")
-            if simbolo.tipo == "sustancia" and simbolo.info.get("unidad") and expr_unit and simbolo.info["unidad"] != expr_unit:
-                self.error(f"Incompatibilidad de unidades: '{name}' tiene '{simbolo.info['unidad']}', expresión tiene '{expr_unit}'")
+            if simbolo.tipo == "sustancia" and simbolo.unidad and expr_unit and simbolo.unidad != expr_unit:
+                self.error(f"Incompatibilidad de unidades: '{name}' tiene '{simbolo.unidad}', expresión tiene '{expr_unit}'")
             self.eat(TipoToken.PUNTUACION, ";")
-            return ("ASIGNACION", name, expr)
-        expr = ("VAR", name)
-        return ("EXPRESSION", expr)
+            return Asignacion(name, expr)
+        self.referencias.usar(name, inicio, USO_VAR)
+        expr = Var(name)
+        return Expresion(expr)
 
     def cmd_definir_reaccion(self):
+        inicio = self.pos
         self.eat(TipoToken.PALABRA_RESERVADA, "reaccionar")
-        name = self.look.valor; self.eat(TipoToken.IDENTIFICADOR)
+        name = self._identificador()
         if self.tabla_simbolos.existe_en_actual(name):
             self.error(f"Reacción '{name}' ya declarada")
         self.eat(TipoToken.PAR_CORCHETE, "[")
-        react = self._lista_reactivos()
+        posiciones = []
+        react = self._lista_reactivos(posiciones)
         self.eat(TipoToken.OPERADOR, "->")
-        prod = self._lista_reactivos()
+        prod = self._lista_reactivos(posiciones)
         self.eat(TipoToken.PAR_CORCHETE, "]")
         self._validar_reaccion(react, prod, name)
-        simbolo_reaccion = Simbolo(name, "reaccion", reactivos=react, productos=prod)
+        simbolo_reaccion = SimboloReaccion(name, react, prod)
         self.tabla_simbolos.insertar(name, simbolo_reaccion)
-        self.tabla_simbolos.entrar_bloque()
-        for _, param in react + prod:
+        self.referencias.declarar(name, "reaccion", inicio, self.pos)
+        self._entrar_bloque()
+        for (_, param), posicion in zip(react + prod, posiciones):
             if self.tabla_simbolos.existe_en_actual(param):
                 self.error(f"Parámetro '{param}' duplicado")
-            self.tabla_simbolos.insertar(param, Simbolo(param, "sustancia"))
+            self.tabla_simbolos.insertar(param, SimboloSustancia(param))
+            self.referencias.declarar(param, "sustancia", posicion, posicion + 1)
         body = self.bloque()
-        self.tabla_simbolos.salir_bloque()
-        return ("DEF_REACCION", name, react, prod, body)
+        self._salir_bloque()
+        return DefReaccion(name, react, prod, body)
 
     def cmd_llamada(self):
-        name = self.look.valor; self.eat(TipoToken.IDENTIFICADOR)
+        inicio = self.pos
+        name = self._identificador()
         simbolo = self.tabla_simbolos.buscar(name)
         if simbolo is None or simbolo.tipo != "reaccion":
             self.error(f"Reacción '{name}' no declarada")
+        self.referencias.usar(name, inicio, USO_LLAMADA)
         self.eat(TipoToken.PAR_CORCHETE, "[")
         args = self._lista_reactivos()
         self.eat(TipoToken.PAR_CORCHETE, "]")
@@ -204,7 +306,7 @@ class Parser:
         for (c1, n1), (c2, n2) in zip(expected, args):
             if n1 != n2 or c1 != c2:
                 self.error(f"Reactivo esperado: {c1}{n1}, encontrado: {c2}{n2}")
-        return ("CALL", name, args)
+        return Llamada(name, args)
 
     def cmd_mezclar_block(self):
         self.eat(TipoToken.PALABRA_RESERVADA, "mezclar")
@@ -212,7 +314,8 @@ class Parser:
         expr = self.expr()
         self.eat(TipoToken.PAR_CORCHETE, ")")
         self.eat(TipoToken.OPERADOR, "->")
-        tgt = self.look.valor; self.eat(TipoToken.IDENTIFICADOR)
+        posicion = self.pos
+        tgt = self._identificador()
         simbolo = self.tabla_simbolos.buscar(tgt)
         if simbolo is None:
             # Detectar unidades de metadatos y unidad de cantidad desde los operandos
@@ -224,21 +327,25 @@ class Parser:
                     if var[0] == "VAR":
                         sim = self.tabla_simbolos.buscar(var[1])
                         if sim:
-                            meta_unidades.update(u for _, u in sim.info.get("metadatos", []))
-                            if not unidad and sim.info.get("unidad"):
-                                unidad = sim.info["unidad"]
+                            meta_unidades.update(u for _, u in sim.metadatos or ())
+                            if not unidad and sim.unidad:
+                                unidad = sim.unidad
             meta_dummy = [("0", u) for u in meta_unidades]
-            simbolo = Simbolo(tgt, "sustancia", cantidad="0", unidad=unidad, metadatos=meta_dummy)
+            simbolo = SimboloSustancia(tgt, "0", unidad, meta_dummy)
             self.tabla_simbolos.insertar(tgt, simbolo)
+            # La declaración implícita no cuenta como uso
+            self.referencias.declarar(tgt, "sustancia", posicion, posicion + 1)
         elif simbolo.tipo != "sustancia":
             self.error(f"Destino '{tgt}' no es una sustancia declarada")
+        else:
+            self.referencias.usar(tgt, posicion, USO_MEZCLAR)
         expr_type, expr_unit = self._infer_type(expr)
         if expr_type != "sustancia":
             self.error(f"La expresión en 'mezclar' debe ser de tipo sustancia, no {expr_type}")
-        if simbolo.info.get("unidad") and expr_unit and simbolo.info["unidad"] != expr_unit:
-            self.error(f"Incompatibilidad de unidades: destino tiene '{simbolo.info['unidad']}', expresión tiene '{expr_unit}'")
+        if simbolo.unidad and expr_unit and simbolo.unidad != expr_unit:
+            self.error(f"Incompatibilidad de unidades: destino tiene '{simbolo.unidad}', expresión tiene '{expr_unit}'")
         self.eat(TipoToken.PUNTUACION, ";")
-        return ("MEZCLAR", expr, ("SUSTANCIA", tgt, "0", None, []))  # Include implicit declaration in AST
+        return Mezclar(expr, Sustancia(tgt, "0", None, []))  # Include implicit declaration in AST
 
     def cmd_balancear(self):
         self.eat(TipoToken.PALABRA_RESERVADA, "balancear")
@@ -247,7 +354,7 @@ class Parser:
         expr_type, _ = self._infer_type(e)
         if expr_type != "sustancia":
             self.error(f"La expresión en 'balancear' debe ser de tipo sustancia, no {expr_type}")
-        return ("BALANCEAR", e)
+        return Balancear(e)
 
     def cmd_mostrar(self):
         self.eat(TipoToken.PALABRA_RESERVADA, "mostrar")
@@ -256,7 +363,7 @@ class Parser:
         while True:
             if self.look.tipo == TipoToken.TEXTO:
                 v = self.look.valor; self.eat(TipoToken.TEXTO)
-                args.append(("TEXT", v))
+                args.append(Texto(v))
             else:
                 v = self.expr()
                 expr_type, _ = self._infer_type(v)
@@ -267,7 +374,7 @@ class Parser:
             self.eat(TipoToken.PUNTUACION, ",")
         self.eat(TipoToken.PAR_CORCHETE, ")")
         self.eat(TipoToken.PUNTUACION, ";")
-        return ("MOSTRAR", args)
+        return Mostrar(args)
 
     def cmd_si(self):
         self.eat(TipoToken.PALABRA_RESERVADA, "si")
@@ -279,7 +386,7 @@ class Parser:
         if self.look.valor == "sino":
             self.eat(TipoToken.PALABRA_RESERVADA, "sino")
             b2 = self.bloque()
-        return ("SI", c, b1, b2)
+        return Si(c, b1, b2)
 
     def cmd_repetir(self):
         if self.look.valor == "repetir":
@@ -290,7 +397,7 @@ class Parser:
             c = self.cond()
             self.eat(TipoToken.PAR_CORCHETE, ")")
             self.eat(TipoToken.PUNTUACION, ";")
-            return ("REPETIR_HASTA", c, b)
+            return RepetirHasta(c, b)
         self.eat(TipoToken.PALABRA_RESERVADA, "hacer")
         b = self.bloque()
         self.eat(TipoToken.PALABRA_RESERVADA, "mientras")
@@ -298,71 +405,96 @@ class Parser:
         c = self.cond()
         self.eat(TipoToken.PAR_CORCHETE, ")")
         self.eat(TipoToken.PUNTUACION, ";")
-        return ("HACER_MIENTRAS", c, b)
+        return HacerMientras(c, b)
 
     def cmd_detener(self):
         self.eat(TipoToken.PALABRA_RESERVADA, "detener")
         self.eat(TipoToken.PUNTUACION, ";")
-        return ("DETENER",)
+        return Detener()
 
     def bloque(self):
         self.eat(TipoToken.LLAVE, "{")
-        self.tabla_simbolos.entrar_bloque()
+        self._entrar_bloque()
         stmts = []
         while not (self.look.tipo == TipoToken.LLAVE and self.look.valor == "}"):
-            stmts.append(self.stmt())
+            if self.recuperar and self.pos >= len(self.tokens):
+                break
+            stmts.append(self._sentencia())
         self.eat(TipoToken.LLAVE, "}")
-        self.tabla_simbolos.salir_bloque()
-        return ("BLOQUE", stmts)
+        self._salir_bloque()
+        return Bloque(stmts)
 
+    # Precedence climbing con pilas explícitas de operandos y operadores (y
+    # marcas "(" por cada paréntesis abierto), así que la profundidad de la
+    # expresión no depende del límite de recursión. Cada operación se verifica
+    # al reducirla, en el mismo orden que la gramática recursiva
+    # expr -> term (+|- term)*, term -> factor (*|/ factor)*.
     def expr(self):
-        node = self.term()
-        while self.look.tipo == TipoToken.OPERADOR and self.look.valor in ("+", "-"):
-            op = self.look.valor
-            self.eat(TipoToken.OPERADOR, op)
-            right = self.term()
-            left_type, left_unit = self._infer_type(node)
-            right_type, right_unit = self._infer_type(right)
-            if op in ["+", "-"]:
-                if left_type == right_type == "sustancia":
-                    if left_unit != right_unit:
-                        self.error(f"Incompatibilidad de unidades: {left_unit} y {right_unit}")
-                    node = ("BIN_OP", op, node, right)
-                elif left_type == "cadena" and right_type == "cadena" and op == "+":
-                    node = ("BIN_OP", op, node, right)
-                elif left_type == right_type == "numero":
-                    node = ("BIN_OP", op, node, right)
-                else:
-                    self.error(f"Operador '{op}' no válido entre tipos {left_type} y {right_type}")
-        return node
+        operandos, operadores = [], []
+        while True:
+            # Un término empieza al inicio, tras "(" y tras + o -; sólo ahí
+            # un operador verbal reservado es un término por sí mismo
+            inicio_termino = not operadores or operadores[-1] not in ("*", "/")
+            if inicio_termino and self.look.tipo == TipoToken.PALABRA_RESERVADA and self.look.valor in OPERADORES_VERBALES:
+                v = OPERADORES_VERBALES[self.look.valor]
+                self.eat(TipoToken.PALABRA_RESERVADA)
+                operandos.append(Var(v))
+                solo_suma = True
+            elif self.look.valor == "(":
+                self.eat(TipoToken.PAR_CORCHETE, "(")
+                operadores.append("(")
+                continue
+            else:
+                operandos.append(self.factor())
+                solo_suma = False
+            while True:
+                op = self.look.valor
+                if self.look.tipo == TipoToken.OPERADOR and op in PRECEDENCIA and not (solo_suma and op in ("*", "/")):
+                    while operadores and operadores[-1] != "(" and PRECEDENCIA[operadores[-1]] >= PRECEDENCIA[op]:
+                        self._reducir(operandos, operadores.pop())
+                    self.eat(TipoToken.OPERADOR, op)
+                    operadores.append(op)
+                    break
+                while operadores and operadores[-1] != "(":
+                    self._reducir(operandos, operadores.pop())
+                if not operadores:
+                    return operandos.pop()
+                operadores.pop()
+                self.eat(TipoToken.PAR_CORCHETE, ")")
+                solo_suma = False
 
-    def term(self):
-        if self.look.tipo == TipoToken.PALABRA_RESERVADA and self.look.valor in OPERADORES_VERBALES:
-            v = OPERADORES_VERBALES[self.look.valor]
-            self.eat(TipoToken.PALABRA_RESERVADA)
-            return ("VAR", v)
-        
-        node = self.factor()
-        while self.look.tipo == TipoToken.OPERADOR and self.look.valor in ("*", "/"):
-            op = self.look.valor
-            self.eat(TipoToken.OPERADOR, op)
-            right = self.factor()
-            left_type, left_unit = self._infer_type(node)
-            right_type, right_unit = self._infer_type(right)
-            if (left_type == "sustancia" and right_type == "numero") or \
-            (left_type == "numero" and right_type == "numero"):
-                node = ("BIN_OP", op, node, right)
+    def _reducir(self, operandos, op):
+        right = operandos.pop()
+        node = operandos.pop()
+        left_type, left_unit = self._infer_type(node)
+        right_type, right_unit = self._infer_type(right)
+        if op in ["+", "-"]:
+            if left_type == right_type == "sustancia":
+                if left_unit != right_unit:
+                    self.error(f"Incompatibilidad de unidades: {left_unit} y {right_unit}")
+                node = BinOp(op, node, right)
+            elif left_type == "cadena" and right_type == "cadena" and op == "+":
+                node = BinOp(op, node, right)
+            elif left_type == right_type == "numero":
+                node = BinOp(op, node, right)
             else:
                 self.error(f"Operador '{op}' no válido entre tipos {left_type} y {right_type}")
-        return node
+        elif (left_type == "sustancia" and right_type == "numero") or \
+        (left_type == "numero" and right_type == "numero"):
+            node = BinOp(op, node, right)
+        else:
+            self.error(f"Operador '{op}' no válido entre tipos {left_type} y {right_type}")
+        operandos.append(node)
 
+    # Operandos simples; los paréntesis los maneja expr()
     def factor(self):
         if self.look.tipo == TipoToken.IDENTIFICADOR or self.look.tipo == TipoToken.PALABRA_RESERVADA:
-            v = self.look.valor
+            v, posicion = self.look.valor, self.pos
             if self.look.tipo == TipoToken.PALABRA_RESERVADA and v in ["PLANCK", "AVOGADRO", "PI"]:
                 self.eat(TipoToken.PALABRA_RESERVADA)
             else:
                 self.eat(TipoToken.IDENTIFICADOR)
+            v = self.contexto.identificador(v)
             simbolo = self.tabla_simbolos.buscar(v)
             if simbolo is None:
                 self.error(f"Variable '{v}' no declarada")
@@ -372,22 +504,32 @@ class Parser:
                 self.eat(TipoToken.PUNTUACION if op == "." else TipoToken.OPERADOR, op)
                 prop = self.look.valor
                 self.eat(TipoToken.IDENTIFICADOR)
-                return ("PROP_ACCESS", v, prop)
-            return ("VAR", v)
+                self.referencias.usar(v, posicion, USO_PROPIEDAD)
+                return AccesoPropiedad(v, prop)
+            self.referencias.usar(v, posicion, USO_VAR)
+            return Var(v)
         if self.look.tipo == TipoToken.NUMERO:
-            v = self.look.valor; self.eat(TipoToken.NUMERO)
-            return ("NUM", v)
+            v = self.contexto.constante(self.look.valor); self.eat(TipoToken.NUMERO)
+            return Num(v)
         if self.look.tipo == TipoToken.TEXTO:
             v = self.look.valor; self.eat(TipoToken.TEXTO)
-            return ("TEXT", v)
-        if self.look.valor == "(":
-            self.eat(TipoToken.PAR_CORCHETE, "(")
-            node = self.expr()
-            self.eat(TipoToken.PAR_CORCHETE, ")")
-            return node
+            return Texto(v)
         self.error(f"Factor inesperado '{self.look.valor}'")
 
+    # Comparaciones unidas por 'y'/'o', anidadas a la derecha:
+    # c1 y c2 o c3 -> Logica(y, c1, Logica(o, c2, c3))
     def cond(self):
+        comparaciones, conjunciones = [self._comparacion()], []
+        while self.look.valor in ("y", "o"):
+            conj = self.look.valor; self.eat(TipoToken.PALABRA_RESERVADA, conj)
+            conjunciones.append(conj)
+            comparaciones.append(self._comparacion())
+        node = comparaciones.pop()
+        while conjunciones:
+            node = Logica(conjunciones.pop(), comparaciones.pop(), node)
+        return node
+
+    def _comparacion(self):
         left = self.expr()
         op = self.look.valor
         if op not in ["==", "!=", "<", ">", "<=", ">="]:
@@ -400,76 +542,105 @@ class Parser:
             self.error(f"Comparación entre tipos incompatibles: {left_type} y {right_type}")
         if left_type == "sustancia" and left_unit != right_unit:
             self.error(f"Incompatibilidad de unidades en comparación: {left_unit} y {right_unit}")
-        node = ("COND", op, left, right)
-        while self.look.valor in ("y", "o"):
-            conj = self.look.valor; self.eat(TipoToken.PALABRA_RESERVADA, conj)
-            nxt = self.cond()
-            node = ("LOGIC", conj, node, nxt)
-        return node
+        return Condicion(op, left, right)
 
-    def _lista_reactivos(self):
+    # Con `posiciones`, agrega a esa lista el token de cada nombre
+    def _lista_reactivos(self, posiciones=None):
         items = []
         while True:
             coeff = "1"
             if self.look.tipo == TipoToken.NUMERO:
                 coeff = self.look.valor; self.eat(TipoToken.NUMERO)
-            name = self.look.valor; self.eat(TipoToken.IDENTIFICADOR)
+            posicion = self.pos
+            name = self._identificador()
             simbolo = self.tabla_simbolos.buscar(name)
             if simbolo is None or simbolo.tipo != "sustancia":
                 self.error(f"Reactivo '{name}' no es una sustancia declarada")
+            self.referencias.usar(name, posicion, USO_PARAMETRO)
+            if posiciones is not None:
+                posiciones.append(posicion)
             items.append((coeff, name))
             if self.look.valor != ",": break
             self.eat(TipoToken.PUNTUACION, ",")
         return items
 
+    # Cada nodo se infiere una sola vez; expr/term/cond/mostrar/mezclar vuelven
+    # a preguntar por los mismos subárboles y reciben el valor guardado. Se
+    # guarda también el nodo para que su id no pueda reutilizarse, y si el
+    # tipo es estable: no lee .temp ni .presion, que dependen de metadatos
+    # que 'mezclar' cambia después, así que el semántico sólo reutiliza los
+    # estables.
     def _infer_type(self, node):
+        entrada = self.tipos.get(id(node))
+        if entrada is not None and entrada[0] is node:
+            return entrada[1], entrada[2]
+        tipo, unidad = self._inferir_tipo(node)
         if isinstance(node, tuple):
-            if node[0] == "VAR":
-                simbolo = self.tabla_simbolos.buscar(node[1])
-                if not simbolo:
-                    self.error(f"Variable '{node[1]}' no declarada")
-                return simbolo.tipo, simbolo.info.get("unidad")
             if node[0] == "PROP_ACCESS":
-                var, prop = node[1], node[2]
-                simbolo = self.tabla_simbolos.buscar(var)
-                if not simbolo:
-                    self.error(f"Variable '{var}' no declarada")
-                if simbolo.tipo != "sustancia":
-                    self.error(f"'{var}' debe ser una sustancia para acceder a la propiedad '{prop}'")
-                if prop == "cant":
-                    return "numero", simbolo.info.get("unidad")
-                elif prop in ["temp", "presion"]:
-                    # Check if the property exists in metadatos
-                    for v, u in simbolo.info.get("metadatos", []):
-                        if (prop == "temp" and u == "gradC") or (prop == "presion" and u == "atm"):
-                            return "numero", u
-                    self.error(f"Propiedad '{prop}' no definida para la sustancia '{var}'")
-                else:
-                    self.error(f"Propiedad desconocida '{prop}' para la sustancia '{var}'")
-                return "desconocido", None
-            if node[0] == "NUM":
-                return "numero", None
-            if node[0] == "TEXT":
-                return "cadena", None
-            if node[0] == "BIN_OP":
-                op, left, right = node[1], node[2], node[3]
-                left_type, left_unit = self._infer_type(left)
-                right_type, right_unit = self._infer_type(right)
-                if op in ["+", "-"] and left_type == right_type == "sustancia":
-                    if left_unit != right_unit:
-                        self.error(f"Incompatibilidad de unidades: {left_unit} y {right_unit}")
-                    return "sustancia", left_unit
-                if op == "+" and left_type == right_type == "cadena":
-                    return "cadena", None
-                if op in ["+", "-"] and left_type == right_type == "numero":
-                    return "numero", None
-                if op in ["*", "/"] and left_type == "sustancia" and right_type == "numero":
-                    return "sustancia", left_unit
-                if op in ["*", "/"] and left_type == right_type == "numero":
-                    return "numero", None
-                self.error(f"Operación '{op}' no válida entre {left_type} y {right_type}")
+                estable = node[2] == "cant"
+            elif node[0] == "BIN_OP":
+                estable = self.tipos[id(node[2])][3] and self.tipos[id(node[3])][3]
+            else:
+                estable = True
+            self.tipos[id(node)] = (node, tipo, unidad, estable)
+        return tipo, unidad
+
+    def _inferir_tipo(self, node):
+        metodo = self.metodo_para(self.tabla_tipo, node)
+        if metodo is None:
+            return "desconocido", None
+        return metodo(self, node)
+
+    def tipo_Var(self, node):
+        simbolo = self.tabla_simbolos.buscar(node[1])
+        if not simbolo:
+            self.error(f"Variable '{node[1]}' no declarada")
+        return simbolo.tipo, simbolo.unidad
+
+    def tipo_AccesoPropiedad(self, node):
+        var, prop = node[1], node[2]
+        simbolo = self.tabla_simbolos.buscar(var)
+        if not simbolo:
+            self.error(f"Variable '{var}' no declarada")
+        if simbolo.tipo != "sustancia":
+            self.error(f"'{var}' debe ser una sustancia para acceder a la propiedad '{prop}'")
+        if prop == "cant":
+            return "numero", simbolo.unidad
+        elif prop in ["temp", "presion"]:
+            # Check if the property exists in metadatos
+            if prop == "temp" and simbolo.temp is not None:
+                return "numero", "gradC"
+            if prop == "presion" and simbolo.presion is not None:
+                return "numero", "atm"
+            self.error(f"Propiedad '{prop}' no definida para la sustancia '{var}'")
+        else:
+            self.error(f"Propiedad desconocida '{prop}' para la sustancia '{var}'")
         return "desconocido", None
 
+    def tipo_Num(self, node):
+        return "numero", None
+
+    def tipo_Texto(self, node):
+        return "cadena", None
+
+    def tipo_BinOp(self, node):
+        op, left, right = node[1], node[2], node[3]
+        left_type, left_unit = self._infer_type(left)
+        right_type, right_unit = self._infer_type(right)
+        if op in ["+", "-"] and left_type == right_type == "sustancia":
+            if left_unit != right_unit:
+                self.error(f"Incompatibilidad de unidades: {left_unit} y {right_unit}")
+            return "sustancia", left_unit
+        if op == "+" and left_type == right_type == "cadena":
+            return "cadena", None
+        if op in ["+", "-"] and left_type == right_type == "numero":
+            return "numero", None
+        if op in ["*", "/"] and left_type == "sustancia" and right_type == "numero":
+            return "sustancia", left_unit
+        if op in ["*", "/"] and left_type == right_type == "numero":
+            return "numero", None
+        self.error(f"Operación '{op}' no válida entre {left_type} y {right_type}")
+
     def _validar_reaccion(self, reactivos, productos, nombre_reaccion):
         for _, name in reactivos + productos:
             simbolo = self.tabla_simbolos.buscar(name)
@@ -478,5 +649,157 @@ class Parser:
         if not reactivos or not productos:
             self.error(f"La reacción '{nombre_reaccion}' debe tener al menos un reactivo y un producto")
 
+    # Los ámbitos de la tabla de símbolos y del índice de referencias van juntos
+    def _entrar_bloque(self):
+        self.tabla_simbolos.entrar_bloque()
+        self.referencias.entrar_bloque()
+
+    def _salir_bloque(self):
+        self.tabla_simbolos.salir_bloque()
+        self.referencias.salir_bloque()
+
+    # Nombres del programa desde el pool del contexto, con su ranura
+    def _identificador(self):
+        valor = self.look.valor; self.eat(TipoToken.IDENTIFICADOR)
+        return self.contexto.identificador(valor)
+
     def _peek_val(self):
-        return self.tokens[self.pos + 1].valor if self.pos + 1 < len(self.tokens) else None
\ No newline at end of file
+        return self.tokens[self.pos + 1].valor if self.pos + 1 < len(self.tokens) else None
+
+# Ámbito global de un ParserIncremental o de generar_sentencias_con_efectos:
+# anota los nombres declarados para saber qué símbolos dejó cada sentencia de
+# primer nivel.
+class _GlobalesRegistrados(dict):
+    __slots__ = ("declarados",)
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.declarados = []
+
+    def __setitem__(self, nombre, simbolo):
+        self.declarados.append(nombre)
+        super().__setitem__(nombre, simbolo)
+
+# El semántico y el intérprete modifican los símbolos de la tabla, así que se
+# guardan y se restauran copias
+def _copiar_simbolos(simbolos):
+    return {nombre: s.copiar() for nombre, s in simbolos.items()}
+
+# Comparar expresiones muy profundas agota la recursión de ==; en ese caso
+# se toman como distintas y se reanalizan las sentencias que las usan
+def _mismo_simbolo(a, b):
+    if a is None or b is None:
+        return a is b
+    try:
+        return a.tipo == b.tipo and a.info == b.info
+    except RecursionError:
+        return False
+
+# Sentencia de primer nivel ya analizada: nodo, rango de tokens [inicio, fin),
+# símbolos globales que declaró, errores que produjo y sus operaciones sobre
+# el índice de referencias (relativas a inicio)
+class SentenciaAnalizada:
+    __slots__ = ("nodo", "inicio", "fin", "efectos", "diagnosticos", "eventos")
+
+    def __init__(self, nodo, inicio, fin, efectos, diagnosticos, eventos):
+        self.nodo = nodo
+        self.inicio = inicio
+        self.fin = fin
+        self.efectos = efectos
+        self.diagnosticos = diagnosticos
+        self.eventos = eventos
+
+# Parser para el análisis en vivo del editor. Tras una edición reanalizada con
+# AFD_Lexico.relexar, reparsear() vuelve a analizar sólo las sentencias de
+# primer nivel (con sus bloques 'reaccionar'/'si' completos) que tocan el rango
+# de tokens cambiado. Las demás se reutilizan con su nodo y los símbolos que
+# declararon, salvo que tuvieran errores o usen un nombre cuya declaración
+# global cambió con la edición.
+class ParserIncremental(Parser):
+    def __init__(self, tokens, tabla_simbolos, contexto=None, mapa=None, recuperar=True):
+        super().__init__(tokens, tabla_simbolos, contexto, mapa, recuperar)
+        self.base = _copiar_simbolos(tabla_simbolos.tablas[0])
+        self.sentencias = None
+
+    def program(self):
+        return self._analizar([], 0, 0, 0)
+
+    # rango_cambiado es el de relexar: los tokens previos [k, j) se
+    # reemplazaron por los nuevos [k, k2)
+    def reparsear(self, tokens, rango_cambiado, mapa=None):
+        self.tokens = tokens
+        if mapa is not None:
+            self.mapa = mapa
+        previas = self.sentencias
+        if previas is None:
+            return self.program()
+        k, j, k2 = rango_cambiado
+        # La primera afectada es la que termina en k o después: puede haber
+        # mirado el token siguiente (como 'si' al buscar 'sino')
+        p = bisect_left(previas, k, key=lambda s: s.fin)
+        return self._analizar(previas, p, j, k2 - j)
+
+    def _analizar(self, previas, p, j, delta):
+        self.sentencias = None
+        globales = _GlobalesRegistrados(_copiar_simbolos(self.base))
+        self.referencias = ReferenciasCruzadas(self.base)
+        for previa in previas[:p]:
+            globales.update(_copiar_simbolos(previa.efectos))
+            self.referencias.reproducir(previa.eventos, previa.inicio)
+        self.tabla_simbolos.tablas = [globales]
+        self.tipos, self.errors = {}, []
+        sentencias = previas[:p]
+        if p < len(previas):
+            self.pos = previas[p].inicio
+        else:
+            self.pos = previas[-1].fin if previas else 0
+        # cambiados: nombres globales cuya declaración difiere del análisis
+        # previo; pendientes: nombres a comparar en la próxima sentencia previa
+        # que vuelva a coincidir con la posición actual
+        i, cambiados, pendientes = p, set(), set()
+        while self.look.tipo != TipoToken.DESCONOCIDO or (self.recuperar and self.pos < len(self.tokens)):
+            while i < len(previas) and (previas[i].inicio < j or previas[i].inicio + delta < self.pos):
+                pendientes.update(previas[i].efectos)
+                i += 1
+            if i < len(previas) and previas[i].inicio + delta == self.pos:
+                previa = previas[i]
+                i += 1
+                for nombre in pendientes:
+                    if _mismo_simbolo(globales.get(nombre), self._declaracion_previa(previas, i - 1, nombre)):
+                        cambiados.discard(nombre)
+                    else:
+                        cambiados.add(nombre)
+                pendientes.clear()
+                fin = previa.fin + delta
+                if not previa.diagnosticos and not (cambiados and self._nombres_usados(self.pos, fin) & cambiados):
+                    sentencias.append(SentenciaAnalizada(previa.nodo, self.pos, fin, previa.efectos, previa.diagnosticos, previa.eventos))
+                    globales.update(_copiar_simbolos(previa.efectos))
+                    self.referencias.reproducir(previa.eventos, self.pos)
+                    cambiados.difference_update(previa.efectos)
+                    self.pos = fin
+                    continue
+                pendientes.update(previa.efectos)
+            sentencias.append(self._sentencia_registrada(globales))
+            pendientes.update(sentencias[-1].efectos)
+        self.sentencias = sentencias
+        self.errors = [d for s in sentencias for d in s.diagnosticos]
+        return Programa([s.nodo for s in sentencias])
+
+    def _sentencia_registrada(self, globales):
+        inicio, errores = self.pos, len(self.errors)
+        globales.declarados.clear()
+        self.referencias.eventos, self.referencias.origen = [], inicio
+        nodo = self._sentencia()
+        eventos, self.referencias.eventos = self.referencias.eventos, None
+        efectos = _copiar_simbolos({nombre: globales[nombre] for nombre in globales.declarados})
+        return SentenciaAnalizada(nodo, inicio, self.pos, efectos, self.errors[errores:], eventos)
+
+    # Símbolo global `nombre` tal como estaba antes de previas[i]
+    def _declaracion_previa(self, previas, i, nombre):
+        for k in range(i - 1, -1, -1):
+            if nombre in previas[k].efectos:
+                return previas[k].efectos[nombre]
+        return self.base.get(nombre)
+
+    def _nombres_usados(self, inicio, fin):
+        return {t.valor for t in self.tokens[inicio:fin] if t.tipo == TipoToken.IDENTIFICADOR}
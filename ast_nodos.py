@@ -0,0 +1,290 @@
+from operator import itemgetter
+
+# Nodos del AST. Cada clase es una tupla (etiqueta, campos...) con
+# __slots__ vacío, así que sigue comparándose, indexándose e imprimiéndose
+# como las tuplas ("BIN_OP", op, izq, der) de antes, pero su clase permite
+# despachar con una sola búsqueda en un diccionario (ver Visitante).
+CLASES_NODO = {}
+
+class Nodo(tuple):
+    __slots__ = ()
+    etiqueta = None
+    campos = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for i, campo in enumerate(cls.campos, 1):
+            setattr(cls, campo, property(itemgetter(i)))
+        CLASES_NODO[cls.etiqueta] = cls
+
+    def __new__(cls, *hijos):
+        return tuple.__new__(cls, (cls.etiqueta,) + hijos)
+
+    def __getnewargs__(self):
+        return tuple(self[1:])
+
+    # Tuplas y listas simples, como las que espera ast_to_bnf
+    def to_tuple(self):
+        return postorden(self, _contenido, _a_tupla)
+
+    # El mismo texto que el repr de la tupla, sin recursión
+    def __repr__(self):
+        return _repr_iterativo(self)
+
+def _contenido(valor):
+    if isinstance(valor, (tuple, list)):
+        return valor
+    return ()
+
+def _a_tupla(valor, *hijos):
+    if isinstance(valor, list):
+        return list(hijos)
+    if isinstance(valor, tuple):
+        return hijos
+    return valor
+
+# Separadores y cierres pendientes en la pila de _repr_iterativo; los
+# distingue de los str del árbol su tipo exacto
+class _Literal(str):
+    __slots__ = ()
+
+# Escribe las partes del texto en orden con una pila de pendientes, así que
+# el costo es lineal en el largo del resultado
+def _repr_iterativo(raiz):
+    partes, pila = [], [raiz]
+    while pila:
+        valor = pila.pop()
+        if type(valor) is _Literal:
+            partes.append(valor)
+        elif isinstance(valor, (tuple, list)):
+            if isinstance(valor, list):
+                apertura, cierre = "[", "]"
+            else:
+                apertura, cierre = "(", ",)" if len(valor) == 1 else ")"
+            partes.append(apertura)
+            pila.append(_Literal(cierre))
+            for i in range(len(valor) - 1, -1, -1):
+                pila.append(valor[i])
+                if i:
+                    pila.append(_SEPARADOR)
+        else:
+            partes.append(repr(valor))
+    return "".join(partes)
+
+_SEPARADOR = _Literal(", ")
+
+# Sentencias
+class Programa(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "PROGRAM", ("sentencias",)
+
+class Sustancia(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "SUSTANCIA", ("nombre", "cantidad", "unidad", "metadatos")
+
+class Numero(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "NUMERO", ("nombre", "expr")
+
+class Cadena(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "CADENA", ("nombre", "valor")
+
+class Asignacion(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "ASIGNACION", ("destino", "expr")
+
+class Expresion(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "EXPRESSION", ("expr",)
+
+class DefReaccion(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "DEF_REACCION", ("nombre", "reactivos", "productos", "cuerpo")
+
+class Llamada(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "CALL", ("nombre", "argumentos")
+
+class Mezclar(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "MEZCLAR", ("expr", "destino")
+
+class Balancear(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "BALANCEAR", ("expr",)
+
+class Mostrar(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "MOSTRAR", ("argumentos",)
+
+class Si(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "SI", ("cond", "entonces", "sino")
+
+class RepetirHasta(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "REPETIR_HASTA", ("cond", "cuerpo")
+
+class HacerMientras(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "HACER_MIENTRAS", ("cond", "cuerpo")
+
+class Detener(Nodo):
+    __slots__ = ()
+    etiqueta = "DETENER"
+
+class Bloque(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "BLOQUE", ("sentencias",)
+
+class Vacia(Nodo):
+    __slots__ = ()
+    etiqueta = "EMPTY"
+
+class Comentario(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "COMMENT", ("texto",)
+
+class ErrorSintaxis(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "ERROR", ("diagnostico",)
+
+# Expresiones y condiciones
+class Var(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "VAR", ("nombre",)
+
+class AccesoPropiedad(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "PROP_ACCESS", ("var", "prop")
+
+class Num(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "NUM", ("valor",)
+
+class Texto(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "TEXT", ("valor",)
+
+class BinOp(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "BIN_OP", ("op", "izquierda", "derecha")
+
+class Condicion(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "COND", ("op", "izquierda", "derecha")
+
+class Logica(Nodo):
+    __slots__ = ()
+    etiqueta, campos = "LOGIC", ("op", "izquierda", "derecha")
+
+# Recorrido en postorden con una pila explícita, así que la profundidad del
+# árbol sólo está limitada por la memoria. hijos(nodo) da los subárboles que
+# se visitan antes que el nodo (vacío en las hojas) y el resultado de cada
+# nodo es visitar(nodo, *resultados de sus hijos).
+def postorden(raiz, hijos, visitar):
+    pendientes = hijos(raiz)
+    if not pendientes:
+        return visitar(raiz)
+    pila, resultados = [(raiz, pendientes), *((h, None) for h in reversed(pendientes))], []
+    while pila:
+        nodo, pendientes = pila.pop()
+        if pendientes is None:
+            pendientes = hijos(nodo)
+            if pendientes:
+                pila.append((nodo, pendientes))
+                pila.extend((h, None) for h in reversed(pendientes))
+                continue
+            resultados.append(visitar(nodo))
+        else:
+            n = len(pendientes)
+            valores = resultados[-n:]
+            del resultados[-n:]
+            resultados.append(visitar(nodo, *valores))
+    return resultados.pop()
+
+# Operandos de una operación binaria (op, izquierda, derecha) con la etiqueta
+# dada; las demás expresiones son hojas para postorden
+def _operandos(etiqueta):
+    def operandos(nodo):
+        if _es_binaria(nodo, etiqueta):
+            return nodo[2], nodo[3]
+        return ()
+    return operandos
+
+def _es_binaria(nodo, etiqueta):
+    return isinstance(nodo, tuple) and len(nodo) == 4 and nodo[0] == etiqueta
+
+operandos_expr = _operandos("BIN_OP")
+
+# Niveles de una expresión que Visitante.reducir recorre con recursión común
+PROFUNDIDAD_RECURSIVA = 200
+
+# Base para los recorridos del AST. Por cada prefijo de `prefijos` se arma
+# al crear la subclase una tabla {clase de nodo: método} con los métodos
+# llamados prefijo + nombre de la clase (p. ej. generar_BinOp), guardada en
+# el atributo tabla_<prefijo>. Las tuplas simples con la misma etiqueta
+# también se aceptan.
+class Visitante:
+    prefijos = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for prefijo in cls.prefijos:
+            tabla = {}
+            for etiqueta, clase in CLASES_NODO.items():
+                metodo = getattr(cls, prefijo + clase.__name__, None)
+                if metodo is not None:
+                    tabla[clase] = tabla[etiqueta] = metodo
+            setattr(cls, "tabla_" + prefijo.strip("_"), tabla)
+
+    @staticmethod
+    def metodo_para(tabla, nodo):
+        metodo = tabla.get(type(nodo))
+        if metodo is None and type(nodo) is tuple and nodo and type(nodo[0]) is str:
+            metodo = tabla.get(nodo[0])
+        return metodo
+
+    # Evalúa la expresión `nodo` en postorden con los métodos de `tabla`: los
+    # nodos de la clase `binaria` (BinOp, Logica) reciben además los
+    # resultados de sus dos operandos y los que no tienen método dan
+    # `defecto`. Usa recursión común en los primeros PROFUNDIDAD_RECURSIVA
+    # niveles, que es lo más rápido para expresiones normales, y una pila
+    # explícita para lo que quede más abajo, así que la profundidad sólo está
+    # limitada por la memoria.
+    def reducir(self, tabla, binaria, nodo, defecto=None, margen=PROFUNDIDAD_RECURSIVA):
+        clase = type(nodo)
+        if clase is not binaria and not (clase is tuple and _es_binaria(nodo, binaria.etiqueta)):
+            metodo = tabla.get(clase)
+            if metodo is None:
+                metodo = self.metodo_para(tabla, nodo)
+                if metodo is None:
+                    return defecto
+            return metodo(self, nodo)
+        if not margen:
+            return self._reducir_con_pila(tabla, binaria, nodo, defecto)
+        izquierda = self.reducir(tabla, binaria, nodo[2], defecto, margen - 1)
+        derecha = self.reducir(tabla, binaria, nodo[3], defecto, margen - 1)
+        return self.metodo_para(tabla, nodo)(self, nodo, izquierda, derecha)
+
+    # Primero apila los nodos en preorden (raíz, derecha, izquierda); al
+    # revés, ese orden es el postorden izquierda, derecha, raíz
+    def _reducir_con_pila(self, tabla, binaria, raiz, defecto):
+        orden, pila = [], [raiz]
+        while pila:
+            nodo = pila.pop()
+            es_binaria = type(nodo) is binaria or _es_binaria(nodo, binaria.etiqueta)
+            orden.append((nodo, es_binaria))
+            if es_binaria:
+                pila.append(nodo[2])
+                pila.append(nodo[3])
+        resultados = []
+        for nodo, es_binaria in reversed(orden):
+            metodo = self.metodo_para(tabla, nodo)
+            if es_binaria:
+                derecha = resultados.pop()
+                resultados[-1] = metodo(self, nodo, resultados[-1], derecha)
+            else:
+                resultados.append(defecto if metodo is None else metodo(self, nodo))
+        return resultados[0]
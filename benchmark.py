@@ -0,0 +1,519 @@
+import contextlib
+import copy
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from analizador_lexico import AFD_Lexico, Trie, calcular_edicion, lex_parallel
+from analizador_semantico import REACCIONES_POR_PROCESO, AnalizadorSemantico, SemanticoIncremental, validar
+from analizador_sintactico import Parser, ParserIncremental
+from cache_ast import CacheAST, analizar
+from codigo_intermedio import CodeGenerator
+from interprete import Interprete
+from mcl_tokens import *
+from optimizador_global import OptimizadorGlobal
+from simbolos import Simbolo, SimboloSustancia, TablaSimbolos, TablaSimbolosIndexada
+
+# Programa sintético con el mismo estilo que los scripts generados por lotes
+def generar_programa(n):
+    lineas = []
+    for i in range(n):
+        lineas.append(f"sustancia S{i} cantidad = {i}.5 mol @[{i % 90} gradC, 1 atm];")
+        if i:
+            lineas.append(f"mezclar (S{i} fusionar S{i - 1}) -> M{i}; # mezcla {i}")
+        lineas.append(f'mostrar("valor", S{i}.cant);')
+    return "\n".join(lineas) + "\n"
+
+def medir(funcion, repeticiones=1):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = funcion()
+    return (time.perf_counter() - inicio) / repeticiones, resultado
+
+def memoria(funcion):
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    resultado = funcion()
+    despues = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return despues - antes, resultado
+
+# Token tal como era antes de __slots__, sólo para comparar
+class _TokenConDict:
+    def __init__(self, tipo, valor, inicio, fin):
+        self.tipo = tipo
+        self.valor = valor
+        self.inicio = inicio
+        self.fin = fin
+        self.codigo = CODIGOS_TOKEN.get(valor)
+
+def memoria_tokens(n=20000):
+    texto = generar_programa(n)
+    print(f"memoria por token ({len(texto)} caracteres):")
+
+    def con_dict():
+        lexico = AFD_Lexico(texto)
+        lexico.fabrica = _TokenConDict
+        return lexico.run()
+
+    for nombre, funcion in (("Token con __dict__", con_dict),
+                            ("Token con __slots__", lambda: AFD_Lexico(texto).run()),
+                            ("TokenArray", lambda: AFD_Lexico(texto).run_compacto())):
+        bytes_usados, tokens = memoria(funcion)
+        print(f"  {nombre:<20} {bytes_usados / len(tokens):7.1f} bytes/token")
+
+def lexico(n=20000):
+    texto = generar_programa(n)
+    print(f"análisis léxico ({len(texto)} caracteres):")
+    for modo in ("afd", "regex"):
+        segundos, tokens = medir(lambda: AFD_Lexico(texto, modo).run())
+        print(f"  modo={modo:<6} {segundos:.3f} s ({len(tokens)} tokens)")
+
+# Costo fijo por llamada al analizador léxico: antes cada instancia construía
+# su propio Trie y su conjunto de delimitadores
+def preparacion(repeticiones=20000):
+    print("preparación por llamada al analizador léxico:")
+
+    def como_antes():
+        Trie()
+        set(' \t\n"={}[]();,.:#')
+        return AFD_Lexico("")
+
+    for nombre, funcion in (("Trie por instancia", como_antes),
+                            ("Trie compartido", lambda: AFD_Lexico(""))):
+        segundos, _ = medir(funcion, repeticiones)
+        print(f"  {nombre:<20} {segundos * 1e6:7.1f} µs")
+
+# Lectura completa como str frente a mmap con tokens perezosos
+def archivo(n=20000):
+    with tempfile.NamedTemporaryFile("w", suffix=".mcl", encoding="utf-8", delete=False) as f:
+        f.write(generar_programa(n))
+    try:
+        print(f"análisis léxico desde archivo ({os.path.getsize(f.name)} bytes):")
+        for nombre, mmap in (("texto decodificado", False), ("mmap", True)):
+            bytes_usados, tokens = memoria(lambda: AFD_Lexico.from_path(f.name, mmap).run())
+            segundos = medir(lambda: AFD_Lexico.from_path(f.name, mmap).run())[0]
+            print(f"  {nombre:<20} {segundos:.3f} s {bytes_usados / len(tokens):7.1f} bytes/token")
+            del tokens
+    finally:
+        os.remove(f.name)
+
+def paralelo(n=20000):
+    with tempfile.NamedTemporaryFile("w", suffix=".mcl", encoding="utf-8", delete=False) as f:
+        f.write(generar_programa(n))
+    try:
+        print(f"análisis léxico en paralelo ({os.cpu_count()} núcleos):")
+        for workers in (1, 2, 4, os.cpu_count()):
+            segundos, tokens = medir(lambda: lex_parallel(f.name, workers))
+            print(f"  workers={workers:<3} {segundos:.3f} s ({len(tokens)} tokens)")
+    finally:
+        os.remove(f.name)
+
+# Un bucle que evalúa literales en cada iteración; antes cada evaluación de
+# un nodo NUM convertía su texto con Decimal()
+def constantes(iteraciones=20000):
+    texto = f"numero x = 0;\nhacer {{ x = x + 1.5 * 2 - 0.5; }} mientras (x < {iteraciones * 2.5});\n"
+    contexto = CompilationContext()
+    ast = Parser(AFD_Lexico(texto, contexto=contexto).run(), TablaSimbolos(), contexto).program()
+    print(f"literales numéricos ({iteraciones} iteraciones):")
+    with contextlib.redirect_stdout(io.StringIO()):
+        segundos, _ = medir(lambda: Interprete(ast, TablaSimbolos(), contexto).ejecutar())
+    print(f"  bucle interpretado     {segundos:.3f} s")
+    literales = ("1.5", "2", "0.5") * iteraciones
+    nodos = [contexto.constante(t) for t in literales]
+    for nombre, funcion in (("Decimal(texto)", lambda: [Decimal(t) for t in literales]),
+                            ("pool de constantes", lambda: [c.decimal for c in nodos])):
+        segundos, _ = medir(funcion)
+        print(f"  {nombre:<22} {segundos * 1e9 / len(literales):.0f} ns/literal")
+
+# Parser que vuelve a inferir cada subárbol como antes de la caché de tipos
+class _ParserSinCache(Parser):
+    def _infer_type(self, node):
+        return self._inferir_tipo(node)
+
+def cadenas(longitudes=(100, 200, 300, 400)):
+    print("inferencia de tipos en cadenas 'a fusionar b fusionar ...':")
+    for n in longitudes:
+        declaraciones = "".join(f"sustancia S{i} cantidad = 1 mol;\n" for i in range(n))
+        cadena = " fusionar ".join(f"S{i}" for i in range(n))
+        tokens = AFD_Lexico(f"{declaraciones}mezclar ({cadena}) -> M;\nmostrar({cadena});\n").run()
+        for nombre, clase in (("sin caché", _ParserSinCache), ("con caché", Parser)):
+            segundos, _ = medir(lambda: clase(tokens, TablaSimbolos()).program())
+            print(f"  n={n:<5} {nombre:<10} {segundos * 1000:8.1f} ms")
+
+# Orden de las ramas if/elif de CodeGenerator.generate_stmt antes del despacho
+# por tabla
+_RAMAS_GENERATE_STMT = ("PROGRAM", "SUSTANCIA", "NUMERO", "CADENA", "ASIGNACION", "EXPRESSION",
+                        "DEF_REACCION", "CALL", "MEZCLAR", "BALANCEAR", "MOSTRAR", "SI",
+                        "REPETIR_HASTA", "HACER_MIENTRAS", "DETENER", "BLOQUE", "COMMENT")
+
+def _rama_por_comparacion(nodo):
+    for i, etiqueta in enumerate(_RAMAS_GENERATE_STMT):
+        if nodo[0] == etiqueta:
+            return i
+
+def despacho(n=20000):
+    ast = Parser(AFD_Lexico(generar_programa(n)).run(), TablaSimbolos()).program()
+    sentencias = ast.sentencias * 10
+    print(f"despacho de {len(sentencias)} sentencias:")
+    tabla = CodeGenerator.tabla_stmt
+    for nombre, funcion in (("cadena if/elif", lambda: [_rama_por_comparacion(s) for s in sentencias]),
+                            ("tabla por clase", lambda: [CodeGenerator.metodo_para(tabla, s) for s in sentencias])):
+        segundos, _ = medir(funcion)
+        print(f"  {nombre:<20} {segundos * 1e9 / len(sentencias):.0f} ns/nodo")
+    segundos, _ = medir(lambda: CodeGenerator(TablaSimbolos()).generate(ast))
+    print(f"  generación completa  {segundos:.3f} s")
+
+# Una edición en medio de un protocolo largo: análisis completo frente a
+# reparsear sólo las sentencias afectadas
+def incremental(n=5000):
+    texto = generar_programa(n)
+    medio = texto.index(f"S{n // 2} cantidad")
+    editado = texto[:medio] + texto[medio:].replace(f"{n // 2}.5 mol", f"{n // 2}.75 mol", 1)
+    contexto = CompilationContext()
+    tokens = AFD_Lexico(texto, contexto=contexto).run()
+    print(f"edición en medio de {len(texto.splitlines())} líneas:")
+    segundos, _ = medir(lambda: Parser(AFD_Lexico(editado, contexto=contexto).run(), TablaSimbolos(), contexto, recuperar=True).program())
+    print(f"  análisis completo      {segundos * 1000:8.1f} ms")
+
+    def reparsear():
+        parser = ParserIncremental(tokens, TablaSimbolos(), contexto)
+        parser.program()
+        lexico = AFD_Lexico(editado, contexto=contexto)
+        nuevos = lexico.relexar(list(tokens), *calcular_edicion(texto, editado))
+        return medir(lambda: parser.reparsear(nuevos, lexico.rango_cambiado))[0]
+
+    print(f"  reparsear              {reparsear() * 1000:8.1f} ms")
+
+# Análisis semántico de un programa con muchas reacciones, con sus cuerpos
+# verificados en este proceso y repartidos entre procesos: los errores tienen
+# que ser los mismos. Cada cuerpo ve la tabla de su definición: el 'mezclar'
+# de la mitad deja a G sin temperatura sólo para los cuerpos siguientes. Los
+# globales declarados después también están en la tabla del parser, pero el
+# parser ya rechaza un cuerpo que los use.
+def reacciones(n=4000):
+    lineas = ["sustancia G cantidad = 1 mol @[25 gradC, 1 atm]; sustancia P cantidad = 0 mol;"]
+    for i in range(n):
+        if i == n // 2:
+            lineas.append("mezclar (P + G) -> G;")
+        lineas.append(f"sustancia A{i} cantidad = {i}.5 mol @[{i % 90} gradC]; sustancia B{i} cantidad = 2 mol;")
+        lineas.append(f"reaccionar R{i} [A{i}, B{i} -> P] {{ numero q = 3 * 2 - 1; mezclar (A{i} + B{i}) -> X; "
+                      f"mostrar(G.temp); si (q > 1) {{ mostrar(X.cant, q); }} sino {{ mostrar(A{i}.cant); }} "
+                      f"hacer {{ q = q - 1; mostrar(\"paso\", q); }} mientras (q > 0); }}")
+    texto = "\n".join(lineas) + "\n"
+    contexto = CompilationContext()
+    tabla = TablaSimbolos()
+    ast = Parser(AFD_Lexico(texto, contexto=contexto).run(), tabla, contexto).program()
+    print(f"semántico con {n} reacciones ({os.cpu_count()} núcleos):")
+    serie = None
+    for procesos in (1, 2, 4, os.cpu_count()):
+        segundos, errores = medir(lambda: AnalizadorSemantico(ast, tabla, contexto).analizar(procesos))
+        serie = errores if serie is None else serie
+        assert errores == serie and len(errores) == 2 * (n - n // 2)
+        usados = max(1, min(procesos, n // REACCIONES_POR_PROCESO))
+        print(f"  procesos={procesos:<3} {segundos:.3f} s ({usados} usados, {len(errores)} errores)")
+    adelantada = texto + "reaccionar Z [A0 -> P] { mostrar(Tarde.cant); }\nsustancia Tarde cantidad = 1 mol;\n"
+    with contextlib.suppress(SyntaxError):
+        Parser(AFD_Lexico(adelantada, contexto=contexto).run(), TablaSimbolos(), contexto).program()
+        raise AssertionError("el parser aceptó un global usado antes de declararlo")
+
+# La misma edición con el semántico: el análisis completo frente a
+# reverificar sólo las sentencias que dependen de la declaración cambiada.
+# Ambos tienen que dar lo mismo que analizar desde cero el texto editado,
+# también marcando sentencias como cambiadas.
+def semantico_incremental(n=5000):
+    texto = generar_programa(n)
+    medio = texto.index(f"S{n // 2} cantidad")
+    editado = texto[:medio] + texto[medio:].replace(f"{n // 2}.5 mol", f"{n // 2}.75 mol", 1)
+    contexto = CompilationContext()
+    tokens = AFD_Lexico(texto, contexto=contexto).run()
+    parser = ParserIncremental(tokens, TablaSimbolos(), contexto)
+    semantico = SemanticoIncremental(contexto)
+    semantico.analizar(parser.program(), parser.tabla_simbolos)
+    lexico = AFD_Lexico(editado, contexto=contexto)
+    ast = parser.reparsear(lexico.relexar(list(tokens), *calcular_edicion(texto, editado)), lexico.rango_cambiado)
+    tabla = TablaSimbolos()
+    desde_cero = AnalizadorSemantico(Parser(AFD_Lexico(editado, contexto=contexto).run(), tabla, contexto).program(),
+                                     tabla, contexto).analizar()
+    print(f"semántico tras editar una declaración ({len(ast[1])} sentencias):")
+    segundos, errores = medir(lambda: AnalizadorSemantico(ast, parser.tabla_simbolos, contexto).analizar())
+    assert errores == desde_cero
+    print(f"  {'completo':<12} {segundos * 1000:8.1f} ms ({len(ast[1])} verificadas)")
+    segundos, errores = medir(lambda: semantico.analizar(ast, parser.tabla_simbolos))
+    assert errores == desde_cero
+    print(f"  {'incremental':<12} {segundos * 1000:8.1f} ms ({semantico.verificadas} verificadas)")
+    assert semantico.analizar(ast, parser.tabla_simbolos, {0, len(ast[1]) // 3}) == desde_cero
+
+# Expresiones mucho más profundas que el límite de recursión de Python, que
+# antes cortaban el análisis con RecursionError. Cada una pasa por el mismo
+# camino que main: parser, optimizador, código intermedio del AST optimizado
+# e intérprete sobre el AST original, y se verifica el resultado de cada
+# etapa además de medirla.
+def profundidad(niveles=(1000, 10000, 100000)):
+    print("expresiones profundas:")
+    for n in niveles:
+        for nombre, expr, valor in (("paréntesis", "(" * n + "1" + ")" * n, "1"),
+                                    ("cadena a+b+...", " + ".join(["1"] * n), str(n))):
+            texto = f"numero x = {expr};\nmostrar(x);\n"
+            tokens = AFD_Lexico(texto).run()
+            tabla = TablaSimbolos()
+            segundos, ast = medir(lambda: Parser(tokens, tabla).program())
+            optimizacion, ast_opt = medir(lambda: OptimizadorGlobal(ast).optimizar())
+            assert ast_opt[1][0] == ("NUMERO", "x", ("NUM", valor)), ast_opt[1][0]
+            generacion, codigo = medir(lambda: CodeGenerator(tabla).generate(ast_opt))
+            assert codigo["pcode"] == ["DECL x numero", f"STO x {valor}", f"PRINT {valor}"], codigo["pcode"]
+            with contextlib.redirect_stdout(io.StringIO()):
+                ejecucion, (resultados, errores) = medir(lambda: Interprete(ast, TablaSimbolos()).ejecutar())
+            assert (resultados, errores) == ([valor], []), (resultados, errores)
+            print(f"  n={n:<6} {nombre:<15} análisis {segundos * 1000:8.1f} ms  optimización {optimizacion * 1000:8.1f} ms"
+                  f"  código {generacion * 1000:6.1f} ms  ejecución {ejecucion * 1000:8.1f} ms")
+
+# Análisis de un texto ya visto: lexar y parsear frente a leer la caché
+def cache(n=5000):
+    texto = generar_programa(n)
+    with tempfile.TemporaryDirectory() as directorio:
+        cache_ast = CacheAST(directorio)
+        print(f"caché de AST ({len(texto.splitlines())} líneas):")
+        segundos, _ = medir(lambda: Parser(AFD_Lexico(texto).run(), TablaSimbolos()).program())
+        print(f"  lexar y parsear        {segundos * 1000:8.1f} ms")
+        segundos, _ = medir(lambda: analizar(texto, cache_ast))
+        print(f"  fallo y guardado       {segundos * 1000:8.1f} ms")
+        segundos, _ = medir(lambda: analizar(texto, cache_ast))
+        print(f"  acierto                {segundos * 1000:8.1f} ms")
+
+# Usos de un nombre recorriendo el AST (una pila de tuplas y listas) frente a
+# la consulta al índice de referencias del parser, y los símbolos sin usar
+def referencias(n=5000, consultas=20):
+    parser = Parser(AFD_Lexico(generar_programa(n)).run(), TablaSimbolos())
+    ast = parser.program()
+    nombres = [f"S{i * n // consultas}" for i in range(consultas)]
+
+    def recorriendo(nombre):
+        usos, pila = 0, [ast]
+        while pila:
+            nodo = pila.pop()
+            if isinstance(nodo, tuple) and nodo and nodo[0] in ("VAR", "PROP_ACCESS") and nodo[1] == nombre:
+                usos += 1
+            elif isinstance(nodo, (tuple, list)):
+                pila.extend(nodo)
+        return usos
+
+    indice = parser.referencias
+    print(f"usos de {consultas} nombres ({len(indice.nombres)} símbolos):")
+    for nombre, buscar in (("recorrer el AST", recorriendo),
+                           ("índice", lambda nombre: len(indice.usos_de(indice.buscar(nombre))))):
+        segundos, _ = medir(lambda: [buscar(nombre) for nombre in nombres])
+        print(f"  {nombre:<18} {segundos * 1e6 / consultas:10.1f} µs/consulta")
+    segundos, sin_usar = medir(indice.sin_usar)
+    print(f"  sin usar           {segundos * 1e6:10.1f} µs ({len(sin_usar)} símbolos)")
+
+# Muchas ejecuciones de un mismo programa: volver a parsear cada vez, copiar
+# la tabla entera y bifurcarla, y bifurcarla en varios hilos
+def ejecuciones(n=200, corridas=200):
+    texto = generar_programa(n)
+    tokens = AFD_Lexico(texto).run()
+    tabla_simbolos = TablaSimbolos()
+    ast = Parser(tokens, tabla_simbolos).program()
+
+    def reparseando():
+        tabla = TablaSimbolos()
+        return Interprete(Parser(tokens, tabla).program(), tabla).ejecutar()
+
+    print(f"{corridas} ejecuciones de un programa de {len(texto.splitlines())} líneas:")
+    for nombre, correr in (("reparsear", reparseando),
+                           ("copia profunda", lambda: Interprete(ast, copy.deepcopy(tabla_simbolos)).ejecutar()),
+                           ("bifurcar", lambda: Interprete(ast, tabla_simbolos.bifurcar()).ejecutar())):
+        with contextlib.redirect_stdout(io.StringIO()):
+            segundos, _ = medir(lambda: [correr() for _ in range(corridas)])
+        print(f"  {nombre:<22} {segundos * 1000 / corridas:.2f} ms/ejecución")
+    for hilos in (2, 4):
+        tablas = [tabla_simbolos.bifurcar() for _ in range(corridas)]
+        with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(hilos) as ejecutor:
+            segundos, _ = medir(lambda: list(ejecutor.map(lambda t: Interprete(ast, t).ejecutar(), tablas)))
+        nombre = f"bifurcar, {hilos} hilos"
+        print(f"  {nombre:<22} {segundos * 1000 / corridas:.2f} ms/ejecución")
+
+# Segundos por fase con el mismo trabajo en los dos caminos (parser,
+# semántico de cada sentencia e intérprete): infiriendo los tipos en el
+# semántico, frente a validar(), donde el semántico toma los tipos estables
+# que anotó el parser. Los errores tienen que ser los mismos.
+def validacion(n=5000):
+    texto = generar_programa(n) + "".join(f"mezclar (S{i} + S{i} + S{i}) -> T{i};\n" for i in range(n))
+    tokens = AFD_Lexico(texto).run()
+
+    def por_separado():
+        tiempos, tabla = {}, TablaSimbolos()
+        parser = Parser(tokens, tabla)
+        tiempos["sintactico"], ast = medir(parser.program)
+        tiempos["semantico"], errores = medir(lambda: AnalizadorSemantico(ast, tabla).analizar())
+        tiempos["ejecucion"], _ = medir(lambda: Interprete(ast, tabla).ejecutar())
+        return tiempos, parser.errors + errores
+
+    def en_una_pasada():
+        tabla = TablaSimbolos()
+        resultado = validar(tokens, tabla)
+        tiempos = dict(resultado.tiempos)
+        tiempos["ejecucion"], _ = medir(lambda: Interprete(resultado.ast, tabla).ejecutar())
+        return tiempos, resultado.errores
+
+    print(f"validación y ejecución ({len(tokens)} tokens):")
+    errores_por_camino = []
+    for nombre, funcion in (("por separado", por_separado), ("una pasada", en_una_pasada)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            tiempos, errores = funcion()
+        errores_por_camino.append(errores)
+        fases = "  ".join(f"{fase} {tiempos[fase]:.3f}" for fase in ("sintactico", "semantico", "ejecucion"))
+        print(f"  {nombre:<14} {fases}  total {sum(tiempos.values()):.3f} s")
+    assert errores_por_camino[0] == errores_por_camino[1]
+
+# Tiempo hasta la primera línea de salida y memoria máxima: analizar todo y
+# después ejecutar, frente a ejecutar cada sentencia apenas se analiza
+def flujo(n=5000):
+    texto = generar_programa(n)
+    tokens = AFD_Lexico(texto).run()
+    print(f"ejecución en flujo ({len(texto.splitlines())} líneas):")
+
+    def en_lote():
+        inicio = time.perf_counter()
+        tabla_simbolos = TablaSimbolos()
+        ast = Parser(tokens, tabla_simbolos).program()
+        interprete = Interprete(ast, tabla_simbolos)
+        interprete.ejecutar()
+        return time.perf_counter() - inicio
+
+    def en_flujo():
+        inicio, primera = time.perf_counter(), None
+        interprete = Interprete(None, TablaSimbolos())
+        for _ in interprete.ejecutar_en_flujo(Parser(tokens, TablaSimbolos()).generar_sentencias_con_efectos()):
+            if primera is None:
+                primera = time.perf_counter() - inicio
+        return primera
+
+    for nombre, funcion in (("analizar y ejecutar", en_lote), ("en flujo", en_flujo)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            tracemalloc.start()
+            primera = funcion()
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        print(f"  {nombre:<20} primera salida {primera * 1000:8.1f} ms  pico {pico / 2 ** 20:6.1f} MiB")
+
+# Variables en una lista indexada por Identificador.ranura, la alternativa
+# al diccionario por nombre del intérprete
+class _VariablesPorRanura:
+    __slots__ = ("ranuras",)
+
+    def __init__(self):
+        self.ranuras = []
+
+    def get(self, nombre, defecto=None):
+        if nombre.ranura < len(self.ranuras) and self.ranuras[nombre.ranura] is not None:
+            return self.ranuras[nombre.ranura]
+        return defecto
+
+    def __contains__(self, nombre):
+        return self.get(nombre) is not None
+
+    def __getitem__(self, nombre):
+        return self.ranuras[nombre.ranura]
+
+    def __setitem__(self, nombre, valor):
+        if nombre.ranura >= len(self.ranuras):
+            self.ranuras.extend([None] * (nombre.ranura + 1 - len(self.ranuras)))
+        self.ranuras[nombre.ranura] = valor
+
+class _InterpreteConRanuras(Interprete):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.variables = _VariablesPorRanura()
+
+# Intérprete que busca cada variable varias veces por acceso, como antes
+class _InterpreteConVariasBusquedas(Interprete):
+    def evaluar_Var(self, expr):
+        name = expr[1]
+        if name in self.variables:
+            print(f"DEBUG: Evaluando '{name}' desde variables: {self.variables[name]}")
+            return self.variables[name].get("valor", self.variables[name].get("cantidad"))
+        return super().evaluar_Var(expr)
+
+# Bucle que lee y asigna varias variables en cada iteración
+def variables(iteraciones=5000):
+    texto = ("numero i = 0;\nnumero a = 0;\nnumero b = 1;\nnumero c = 2;\nsustancia S cantidad = 1 mol;\n"
+             f"hacer {{ a = a + b * c - b; S.cant = S.cant + c; b = b + c / c; i = i + 1; }} mientras (i < {iteraciones});\n")
+    contexto = CompilationContext()
+    ast = Parser(AFD_Lexico(texto, contexto=contexto).run(), TablaSimbolos(), contexto).program()
+    print(f"bucle con variables ({iteraciones} iteraciones):")
+    for nombre, clase in (("varias búsquedas", _InterpreteConVariasBusquedas), ("lista por ranura", _InterpreteConRanuras),
+                          ("una búsqueda", Interprete)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            segundos, _ = medir(lambda: clase(ast, TablaSimbolos(), contexto).ejecutar(), 5)
+        print(f"  {nombre:<20} {segundos:.3f} s")
+
+# Búsqueda de un nombre global desde ámbitos anidados, y entrar/salir de un
+# ámbito con algunos nombres
+def tabla_simbolos(profundidades=(1, 10, 100), busquedas=100000):
+    print(f"tabla de símbolos ({busquedas} búsquedas):")
+    for profundidad in profundidades:
+        for clase in (TablaSimbolos, TablaSimbolosIndexada):
+            tabla = clase()
+            tabla.insertar("x", None)
+            for _ in range(profundidad - 1):
+                tabla.entrar_bloque()
+            buscar = medir(lambda: [tabla.buscar("x") for _ in range(busquedas)])[0]
+
+            def ambito():
+                for _ in range(busquedas // 10):
+                    tabla.entrar_bloque()
+                    for nombre in "abcd":
+                        tabla.insertar(nombre, None)
+                    tabla.salir_bloque()
+
+            ciclo = medir(ambito)[0]
+            print(f"  profundidad={profundidad:<4} {clase.__name__:<22} buscar {buscar * 1e9 / busquedas:6.0f} ns"
+                  f"  ámbito de 4 nombres {ciclo * 1e10 / busquedas:6.0f} ns")
+
+# Memoria de n símbolos de sustancia y lectura de su unidad y temperatura,
+# con el diccionario de kwargs de antes y con la clase tipada
+def simbolos(n=100000):
+    metadatos = [("25", "gradC"), ("1", "atm")]
+    print(f"símbolos de sustancia ({n}):")
+    for nombre, crear, unidad, temp in (
+            ("diccionario info", lambda i: Simbolo(f"S{i}", "sustancia", cantidad="1", unidad="mol", metadatos=metadatos),
+             lambda s: s.info.get("unidad"), lambda s: next((v for v, u in s.info.get("metadatos", []) if u == "gradC"), None)),
+            ("__slots__", lambda i: SimboloSustancia(f"S{i}", "1", "mol", metadatos),
+             lambda s: s.unidad, lambda s: s.temp)):
+        bytes_, lista = memoria(lambda: [crear(i) for i in range(n)])
+        leer_unidad = medir(lambda: [unidad(s) for s in lista])[0]
+        leer_temp = medir(lambda: [temp(s) for s in lista])[0]
+        print(f"  {nombre:<18} {bytes_ / n:5.0f} B/símbolo  unidad {leer_unidad * 1e9 / n:4.0f} ns"
+              f"  temp {leer_temp * 1e9 / n:4.0f} ns")
+
+PRUEBAS = {
+    "archivo": archivo,
+    "cache": cache,
+    "cadenas": cadenas,
+    "constantes": constantes,
+    "despacho": despacho,
+    "ejecuciones": ejecuciones,
+    "flujo": flujo,
+    "incremental": incremental,
+    "lexico": lexico,
+    "memoria_tokens": memoria_tokens,
+    "paralelo": paralelo,
+    "preparacion": preparacion,
+    "profundidad": profundidad,
+    "reacciones": reacciones,
+    "referencias": referencias,
+    "semantico_incremental": semantico_incremental,
+    "simbolos": simbolos,
+    "tabla_simbolos": tabla_simbolos,
+    "validacion": validacion,
+    "variables": variables,
+}
+
+if __name__ == "__main__":
+    for nombre in sys.argv[1:] or PRUEBAS:
+        PRUEBAS[nombre]()
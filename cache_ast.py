@@ -0,0 +1,220 @@
+import contextlib
+import gc
+import hashlib
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import analizador_lexico
+import analizador_sintactico
+import ast_nodos
+import mcl_tokens
+import mapa_fuente
+import referencias
+import simbolos
+from analizador_lexico import AFD_Lexico
+from analizador_sintactico import Parser
+from mcl_tokens import CompilationContext, Token
+from simbolos import TablaSimbolos
+
+# Versión del formato de los archivos de la caché; subirla al cambiar lo que
+# guarda AnalisisGuardado
+FORMATO = 2
+_MAGICO = b"MCLAST"
+_CABECERA = struct.Struct("<6sH32s")
+
+DIRECTORIO_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "mcl", "ast")
+LIMITE_CACHE = 64 * 1024 * 1024
+
+# Módulos de los que depende lo guardado: gramática, códigos de token, clases
+# de nodo, de símbolos y de referencias. Cualquier cambio en ellos cambia el
+# sello.
+_MODULOS_SELLO = (mcl_tokens, analizador_lexico, analizador_sintactico, ast_nodos, mapa_fuente, referencias, simbolos)
+_sello = None
+
+def sello_compilador():
+    global _sello
+    if _sello is None:
+        h = hashlib.sha256(b"%s %d %d.%d" % (_MAGICO, FORMATO, *sys.version_info[:2]))
+        for modulo in _MODULOS_SELLO:
+            with open(modulo.__file__, "rb") as f:
+                h.update(f.read())
+        _sello = h.digest()
+    return _sello
+
+# Resultado del análisis léxico y sintáctico de un texto. El contexto es el
+# que asignó los códigos de los tokens y las constantes del AST; referencias
+# es el índice de declaraciones y usos del parser.
+class AnalisisGuardado:
+    __slots__ = ("tokens", "ast", "tabla_simbolos", "errores", "contexto", "referencias")
+
+    def __init__(self, tokens, ast, tabla_simbolos, errores, contexto, referencias):
+        self.tokens = tokens
+        self.ast = ast
+        self.tabla_simbolos = tabla_simbolos
+        self.errores = errores
+        self.contexto = contexto
+        self.referencias = referencias
+
+    # Los tokens van como tuplas, que pickle escribe y lee sin llamar a
+    # Python por cada token
+    def __getstate__(self):
+        tokens = [(t.tipo, t.valor, t.inicio, t.fin, t.codigo) for t in self.tokens]
+        return tokens, self.ast, self.tabla_simbolos, self.errores, self.contexto, self.referencias
+
+    def __setstate__(self, estado):
+        tokens, self.ast, self.tabla_simbolos, self.errores, self.contexto, self.referencias = estado
+        self.tokens = [_token(*t) for t in tokens]
+
+# Tuplas y listas del AST con cada una después de sus hijos. pickle las
+# escribe en ese orden antes que el análisis, así que al llegar a un nodo sus
+# hijos ya están en la memo y no recorre el árbol en profundidad.
+def _nodos_en_postorden(raiz):
+    nodos, vistos, pila = [], set(), [(raiz, False)]
+    while pila:
+        valor, listo = pila.pop()
+        if id(valor) in vistos:
+            continue
+        if listo:
+            vistos.add(id(valor))
+            nodos.append(valor)
+        else:
+            pila.append((valor, True))
+            pila.extend((h, False) for h in reversed(valor) if isinstance(h, (tuple, list)))
+    return nodos
+
+# El recolector de ciclos recorre una y otra vez los objetos que pickle va
+# creando o visitando y más que duplica el tiempo de cargar o guardar un
+# análisis grande, sin liberar nada: todos siguen en uso al terminar
+@contextlib.contextmanager
+def _sin_recolector():
+    activo = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if activo:
+            gc.enable()
+
+def _token(tipo, valor, inicio, fin, codigo):
+    token = Token.__new__(Token)
+    token.tipo, token.valor, token.inicio, token.fin, token.codigo = tipo, valor, inicio, fin, codigo
+    return token
+
+# Directorio con un archivo por texto analizado, nombrado por el hash del
+# texto, las opciones del parser y el sello del compilador. Cada archivo es
+# una cabecera (mágico, FORMATO, sello) seguida del pickle del análisis. Los
+# aciertos actualizan la fecha de modificación y al guardar se borran los
+# archivos más viejos hasta quedar bajo `limite` bytes.
+class CacheAST:
+    def __init__(self, directorio=DIRECTORIO_CACHE, limite=LIMITE_CACHE):
+        self.directorio = directorio
+        self.limite = limite
+
+    def ruta(self, texto, recuperar=False):
+        h = hashlib.sha256(sello_compilador())
+        h.update(b"R" if recuperar else b"-")
+        h.update(texto.encode("utf-8", "surrogatepass"))
+        return os.path.join(self.directorio, h.hexdigest() + ".ast")
+
+    def buscar(self, texto, recuperar=False):
+        ruta = self.ruta(texto, recuperar)
+        try:
+            with open(ruta, "rb") as f:
+                cabecera = f.read(_CABECERA.size)
+                if cabecera != _CABECERA.pack(_MAGICO, FORMATO, sello_compilador()):
+                    raise ValueError("cabecera de otra versión")
+                with _sin_recolector():
+                    _, analisis = pickle.load(f)
+            os.utime(ruta)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError):
+            # Archivo truncado o de otra versión: se descarta
+            self._borrar(ruta)
+            return None
+        return analisis
+
+    # Devuelve False si el análisis no se pudo guardar
+    def guardar(self, texto, analisis, recuperar=False):
+        try:
+            with _sin_recolector():
+                datos = pickle.dumps((_nodos_en_postorden(analisis.ast), analisis), pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            # Algún árbol profundo fuera del AST (p. ej. una copia en la tabla
+            # de símbolos): no se guarda
+            return False
+        if len(datos) + _CABECERA.size > self.limite:
+            return False
+        temporal = None
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            descriptor, temporal = tempfile.mkstemp(".tmp", dir=self.directorio)
+            with os.fdopen(descriptor, "wb") as f:
+                f.write(_CABECERA.pack(_MAGICO, FORMATO, sello_compilador()))
+                f.write(datos)
+            os.replace(temporal, self.ruta(texto, recuperar))
+        except OSError:
+            if temporal is not None:
+                self._borrar(temporal)
+            return False
+        self._podar()
+        return True
+
+    def limpiar(self):
+        for ruta, _, _ in self._archivos():
+            self._borrar(ruta)
+
+    def _archivos(self):
+        archivos = []
+        try:
+            entradas = os.scandir(self.directorio)
+        except OSError:
+            return archivos
+        with entradas:
+            for entrada in entradas:
+                if entrada.name.endswith(".ast"):
+                    try:
+                        estado = entrada.stat()
+                    except OSError:
+                        continue
+                    archivos.append((entrada.path, estado.st_mtime_ns, estado.st_size))
+        return archivos
+
+    # Borra los archivos usados hace más tiempo hasta quedar bajo el límite
+    def _podar(self):
+        archivos = self._archivos()
+        total = sum(tamano for _, _, tamano in archivos)
+        if total <= self.limite:
+            return
+        archivos.sort(key=lambda a: a[1])
+        for ruta, _, tamano in archivos:
+            if total <= self.limite:
+                break
+            self._borrar(ruta)
+            total -= tamano
+
+    @staticmethod
+    def _borrar(ruta):
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+# Análisis léxico y sintáctico de `texto` pasando por la caché: si hay un
+# acierto no se vuelve a lexar ni a parsear. Los errores de sintaxis que
+# lanza el parser (SyntaxError) no se guardan.
+def analizar(texto, cache, contexto=None, recuperar=False):
+    analisis = cache.buscar(texto, recuperar)
+    if analisis is not None:
+        return analisis
+    if contexto is None:
+        contexto = CompilationContext()
+    lexico = AFD_Lexico(texto, contexto=contexto)
+    tokens = lexico.run()
+    tabla_simbolos = TablaSimbolos()
+    parser = Parser(tokens, tabla_simbolos, contexto, lexico.mapa_fuente, recuperar=recuperar)
+    analisis = AnalisisGuardado(tokens, parser.program(), tabla_simbolos, parser.errors, contexto, parser.referencias)
+    cache.guardar(texto, analisis, recuperar)
+    return analisis
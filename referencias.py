@@ -0,0 +1,137 @@
+from array import array
+
+# Clases de uso de un símbolo
+USO_VAR = 0         # variable en una expresión o como sentencia
+USO_PROPIEDAD = 1   # S.cant, S.temp, S.presion en una expresión
+USO_ASIGNACION = 2  # destino de '=' (también S.prop = ...)
+USO_LLAMADA = 3     # nombre de la reacción en una llamada
+USO_MEZCLAR = 4     # destino de 'mezclar'
+USO_PARAMETRO = 5   # sustancia en la lista de reactivos/productos
+
+NOMBRES_USO = ("variable", "propiedad", "asignación", "llamada", "mezclar", "parámetro")
+
+# Operaciones guardadas en `eventos` (ver ParserIncremental)
+_DECLARAR, _USAR, _ENTRAR, _SALIR = range(4)
+
+# Índice de declaraciones y usos que arma el parser mientras analiza. Cada
+# declaración es un símbolo con id entero (su posición en `nombres`); los
+# datos van en arreglos por id: rango de tokens [inicio, fin) de la
+# declaración en `declaraciones` (inicio y fin seguidos, -1 para las
+# constantes predefinidas) y pares (token, clase de uso) seguidos en
+# `usos[id]`, que es una tupla vacía hasta el primer uso. Los nombres se
+# resuelven con una pila de ids por nombre y por ámbito, como
+# TablaSimbolosIndexada, así que el índice no depende de la identidad de los
+# objetos Simbolo (que el semántico y ParserIncremental copian).
+class ReferenciasCruzadas:
+    def __init__(self, predefinidos=None):
+        self.nombres = []
+        self.tipos = []
+        self.declaraciones = array("q")
+        self.usos = []
+        # ids declarados en el texto sin ningún uso, en orden de declaración
+        self._sin_usar = {}
+        # nombre -> pila de (nivel, id); por ámbito, los nombres declarados
+        self._visibles = {}
+        self._ambitos = [[]]
+        # Con una lista, las operaciones se anotan también en ella con los
+        # tokens relativos a `origen`, para reproducirlas con reproducir()
+        self.eventos = None
+        self.origen = 0
+        for nombre, simbolo in (predefinidos or {}).items():
+            self.declarar(nombre, simbolo.tipo, -1, -1)
+
+    # Consultas
+
+    # id del símbolo que `nombre` ve desde el ámbito actual (el global una
+    # vez terminado el análisis), o None
+    def buscar(self, nombre):
+        pila = self._visibles.get(nombre)
+        return pila[-1][1] if pila else None
+
+    def declarado_en(self, simbolo):
+        return self.declaraciones[2 * simbolo], self.declaraciones[2 * simbolo + 1]
+
+    # Pares (token, clase de uso) en orden de aparición
+    def usos_de(self, simbolo):
+        usos = self.usos[simbolo]
+        return list(zip(usos[::2], usos[1::2]))
+
+    def cantidad_usos(self, simbolo):
+        return len(self.usos[simbolo]) // 2
+
+    # ids declarados en el texto que no se usan en ninguna parte
+    def sin_usar(self):
+        return list(self._sin_usar)
+
+    # Registro durante el análisis
+
+    @property
+    def profundidad(self):
+        return len(self._ambitos)
+
+    def entrar_bloque(self):
+        self._ambitos.append([])
+        if self.eventos is not None:
+            self.eventos.append((_ENTRAR,))
+
+    def salir_bloque(self):
+        if len(self._ambitos) > 1:
+            for nombre in self._ambitos.pop():
+                pila = self._visibles[nombre]
+                pila.pop()
+                if not pila:
+                    del self._visibles[nombre]
+        if self.eventos is not None:
+            self.eventos.append((_SALIR,))
+
+    # Redeclarar en el mismo ámbito tapa la declaración anterior, como
+    # insertar en la tabla de símbolos
+    def declarar(self, nombre, tipo, inicio, fin):
+        simbolo = len(self.nombres)
+        self.nombres.append(nombre)
+        self.tipos.append(tipo)
+        self.declaraciones.extend((inicio, fin))
+        self.usos.append(())
+        if inicio >= 0:
+            self._sin_usar[simbolo] = None
+        nivel = len(self._ambitos) - 1
+        pila = self._visibles.get(nombre)
+        if pila is None:
+            self._visibles[nombre] = [(nivel, simbolo)]
+            self._ambitos[-1].append(nombre)
+        elif pila[-1][0] == nivel:
+            pila[-1] = (nivel, simbolo)
+        else:
+            pila.append((nivel, simbolo))
+            self._ambitos[-1].append(nombre)
+        if self.eventos is not None:
+            self.eventos.append((_DECLARAR, nombre, tipo, inicio - self.origen, fin - self.origen))
+        return simbolo
+
+    # Los nombres sin declaración visible no se anotan
+    def usar(self, nombre, token, clase):
+        pila = self._visibles.get(nombre)
+        if pila is not None:
+            simbolo = pila[-1][1]
+            usos = self.usos[simbolo]
+            if not usos:
+                usos = self.usos[simbolo] = array("q")
+                self._sin_usar.pop(simbolo, None)
+            usos.extend((token, clase))
+        if self.eventos is not None:
+            self.eventos.append((_USAR, nombre, token - self.origen, clase))
+
+    # Repite operaciones anotadas con los tokens corridos a `origen`
+    def reproducir(self, eventos, origen):
+        for evento in eventos:
+            operacion = evento[0]
+            if operacion == _DECLARAR:
+                _, nombre, tipo, inicio, fin = evento
+                self.declarar(nombre, tipo, inicio + origen, fin + origen)
+            elif operacion == _USAR:
+                _, nombre, token, clase = evento
+                self.usar(nombre, token + origen, clase)
+            elif operacion == _ENTRAR:
+                self.entrar_bloque()
+            else:
+                self.salir_bloque()
@@ -1,16 +1,169 @@
+import threading
+from collections.abc import MutableMapping
+
+# Símbolo genérico con sus datos en el diccionario `info`. Las declaraciones
+# del lenguaje usan las clases tipadas de abajo; unidad, metadatos, temp y
+# presion dan la misma lectura en ambos casos.
 class Simbolo:
     def __init__(self, nombre, tipo, **kwargs):
         self.nombre = nombre
         self.tipo = tipo
         self.info = kwargs.copy()
 
+    @property
+    def unidad(self):
+        return self.info.get("unidad")
+
+    @property
+    def metadatos(self):
+        return self.info.get("metadatos")
+
+    @metadatos.setter
+    def metadatos(self, metadatos):
+        self.info["metadatos"] = metadatos
+
+    @property
+    def temp(self):
+        return _valor_metadato(self.metadatos, "gradC")
+
+    @property
+    def presion(self):
+        return _valor_metadato(self.metadatos, "atm")
+
+    def copiar(self):
+        return Simbolo(self.nombre, self.tipo, **self.info)
+
+# Valor del primer metadato con la unidad dada, o None
+def _valor_metadato(metadatos, unidad):
+    for v, u in metadatos or ():
+        if u == unidad:
+            return v
+    return None
+
+# Base de los símbolos tipados: un atributo por dato en __slots__, sin
+# diccionario por instancia. Los atributos de clase son lo que leen los
+# chequeos de tipos en símbolos que no tienen ese dato (p. ej. la unidad de
+# un número). `campos` son los datos que muestra `info`.
+class SimboloTipado:
+    __slots__ = ("nombre",)
+    tipo = None
+    campos = ()
+    unidad = metadatos = temp = presion = valor = None
+
+    @property
+    def info(self):
+        return InfoSimbolo(self)
+
+    def copiar(self):
+        return type(self)(self.nombre, *(getattr(self, campo) for campo in self.campos))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.nombre!r}, {dict(self.info)!r})"
+
+# Vista de diccionario sobre los campos de un símbolo tipado, para el código
+# que todavía usa simbolo.info["..."] (la GUI, _mismo_simbolo). Un campo en
+# None cuenta como ausente.
+class InfoSimbolo(MutableMapping):
+    __slots__ = ("simbolo",)
+
+    def __init__(self, simbolo):
+        self.simbolo = simbolo
+
+    def __getitem__(self, clave):
+        if clave in self.simbolo.campos:
+            valor = getattr(self.simbolo, clave)
+            if valor is not None:
+                return valor
+        raise KeyError(clave)
+
+    def __setitem__(self, clave, valor):
+        if clave not in self.simbolo.campos:
+            raise KeyError(clave)
+        setattr(self.simbolo, clave, valor)
+
+    def __delitem__(self, clave):
+        self[clave]
+        setattr(self.simbolo, clave, None)
+
+    def __iter__(self):
+        return (campo for campo in self.simbolo.campos if getattr(self.simbolo, campo) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+# temp y presion son los valores de los primeros metadatos en gradC y atm; se
+# recalculan al reemplazar la lista de metadatos
+class SimboloSustancia(SimboloTipado):
+    __slots__ = ("cantidad", "unidad", "_metadatos", "temp", "presion")
+    tipo = "sustancia"
+    campos = ("cantidad", "unidad", "metadatos")
+
+    def __init__(self, nombre, cantidad=None, unidad=None, metadatos=None):
+        self.nombre = nombre
+        self.cantidad = cantidad
+        self.unidad = unidad
+        self.metadatos = metadatos
+
+    @property
+    def metadatos(self):
+        return self._metadatos
+
+    @metadatos.setter
+    def metadatos(self, metadatos):
+        self._metadatos = metadatos
+        self.temp = _valor_metadato(metadatos, "gradC")
+        self.presion = _valor_metadato(metadatos, "atm")
+
+class SimboloNumero(SimboloTipado):
+    __slots__ = ("valor",)
+    tipo = "numero"
+    campos = ("valor",)
+
+    def __init__(self, nombre, valor=None):
+        self.nombre = nombre
+        self.valor = valor
+
+class SimboloCadena(SimboloTipado):
+    __slots__ = ("valor",)
+    tipo = "cadena"
+    campos = ("valor",)
+
+    def __init__(self, nombre, valor=None):
+        self.nombre = nombre
+        self.valor = valor
+
+class SimboloReaccion(SimboloTipado):
+    __slots__ = ("reactivos", "productos")
+    tipo = "reaccion"
+    campos = ("reactivos", "productos")
+
+    def __init__(self, nombre, reactivos=None, productos=None):
+        self.nombre = nombre
+        self.reactivos = reactivos
+        self.productos = productos
+
+_bloqueo_bifurcar = threading.Lock()
+
+# Los ámbitos son diccionarios en `tablas`, del global al actual. bifurcar()
+# da otra tabla que comparte los ámbitos y los símbolos existentes, para
+# ejecutar varias veces (o en varios hilos) un programa ya parseado: cada
+# tabla copia un ámbito compartido la primera vez que inserta en él y un
+# símbolo compartido la primera vez que lo pide con modificable(), así que
+# ninguna ve los cambios de la otra.
 class TablaSimbolos:
     def __init__(self):
         self.tablas = [{}]
+        # Ámbitos compartidos con otras tablas, por id, y símbolos que esta
+        # tabla puede cambiar en el lugar; None mientras no se haya bifurcado
+        self.compartidas = {}
+        self.propios = None
         # Agregar constantes predefinidas
-        self.insertar("PLANCK", Simbolo("PLANCK", "numero", valor=6.62607015e-34))
-        self.insertar("AVOGADRO", Simbolo("AVOGADRO", "numero", valor=6.02214076e23))
-        self.insertar("PI", Simbolo("PI", "numero", valor=3.1415926535))
+        self.insertar("PLANCK", SimboloNumero("PLANCK", 6.62607015e-34))
+        self.insertar("AVOGADRO", SimboloNumero("AVOGADRO", 6.02214076e23))
+        self.insertar("PI", SimboloNumero("PI", 3.1415926535))
 
     def entrar_bloque(self):
         self.tablas.append({})
@@ -19,8 +172,17 @@ class TablaSimbolos:
         if len(self.tablas) > 1:
             self.tablas.pop()
 
+    # Cantidad de ámbitos abiertos, contando el global
+    @property
+    def profundidad(self):
+        return len(self.tablas)
+
     def insertar(self, nombre, simbolo):
-        self.tablas[-1][nombre] = simbolo
+        if self.propios is None:
+            self.tablas[-1][nombre] = simbolo
+        else:
+            self._propia(len(self.tablas) - 1)[nombre] = simbolo
+            self.propios.add(simbolo)
 
     def buscar(self, nombre):
         for tabla in reversed(self.tablas):
@@ -28,5 +190,122 @@ class TablaSimbolos:
                 return tabla[nombre]
         return None
 
+    # Como buscar, para cambiar los datos del símbolo: si lo comparte con
+    # otra tabla lo reemplaza antes por una copia en su mismo ámbito
+    def modificable(self, nombre):
+        for i in range(len(self.tablas) - 1, -1, -1):
+            if nombre in self.tablas[i]:
+                simbolo = self.tablas[i][nombre]
+                if self.propios is not None and simbolo not in self.propios:
+                    simbolo = simbolo.copiar()
+                    self._propia(i)[nombre] = simbolo
+                    self.propios.add(simbolo)
+                return simbolo
+        return None
+
+    def existe_en_actual(self, nombre):
+        return nombre in self.tablas[-1]
+
+    # Tabla con los mismos ámbitos y símbolos, en O(ámbitos). Desde acá los
+    # símbolos existentes quedan compartidos también para esta tabla. Marcar
+    # los ámbitos compartidos cambia el estado de esta tabla, así que varios
+    # hilos pueden bifurcar la misma a la vez (el bloqueo es del módulo para
+    # que la tabla se siga pudiendo guardar con pickle); lo que no puede es
+    # insertar o modificar en ella otro hilo mientras tanto.
+    def bifurcar(self):
+        with _bloqueo_bifurcar:
+            for tabla in self.tablas:
+                self.compartidas[id(tabla)] = tabla
+            self.propios = set()
+            copia = TablaSimbolos.__new__(TablaSimbolos)
+            copia.tablas = list(self.tablas)
+            copia.compartidas = dict(self.compartidas)
+            copia.propios = set()
+        return copia
+
+    # Tabla que ve los ámbitos y símbolos de `tabla` (TablaSimbolos o
+    # TablaSimbolosIndexada) y los copia al escribir, como una bifurcación,
+    # pero sin marcar nada en `tabla`; sirve mientras `tabla` no cambie
+    @classmethod
+    def vista(cls, tabla):
+        copia = cls.__new__(cls)
+        copia.tablas = list(tabla.tablas)
+        copia.compartidas = {id(t): t for t in copia.tablas}
+        copia.propios = set()
+        return copia
+
+    # El ámbito i, copiado antes si es compartido
+    def _propia(self, i):
+        tabla = self.tablas[i]
+        if id(tabla) in self.compartidas:
+            tabla = self.tablas[i] = tabla.copy()
+        return tabla
+
+# Misma interfaz que TablaSimbolos con buscar, insertar y existe_en_actual en
+# tiempo constante: un solo diccionario nombre -> pila de (nivel, símbolo) y,
+# por ámbito, la lista de nombres que se insertaron en él, que salir_bloque
+# deshace en O(k) con k los nombres del ámbito. `tablas` arma los
+# diccionarios por ámbito sólo cuando se piden (p. ej. para la GUI); como es
+# una copia, ParserIncremental y Parser.generar_sentencias_con_efectos, que
+# reemplazan el ámbito global, siguen necesitando TablaSimbolos, igual que
+# quien necesite bifurcar la tabla.
+class TablaSimbolosIndexada:
+    def __init__(self):
+        self.simbolos = {}
+        self.registro = [[]]
+        self.insertar("PLANCK", SimboloNumero("PLANCK", 6.62607015e-34))
+        self.insertar("AVOGADRO", SimboloNumero("AVOGADRO", 6.02214076e23))
+        self.insertar("PI", SimboloNumero("PI", 3.1415926535))
+
+    def entrar_bloque(self):
+        self.registro.append([])
+
+    def salir_bloque(self):
+        if len(self.registro) > 1:
+            for nombre in self.registro.pop():
+                pila = self.simbolos[nombre]
+                pila.pop()
+                if not pila:
+                    del self.simbolos[nombre]
+
+    @property
+    def profundidad(self):
+        return len(self.registro)
+
+    # Redeclarar en el mismo ámbito reemplaza el símbolo sin volver a
+    # registrar el nombre
+    def insertar(self, nombre, simbolo):
+        nivel = len(self.registro) - 1
+        pila = self.simbolos.get(nombre)
+        if pila is None:
+            self.simbolos[nombre] = [(nivel, simbolo)]
+        elif pila[-1][0] == nivel:
+            pila[-1] = (nivel, simbolo)
+            return
+        else:
+            pila.append((nivel, simbolo))
+        self.registro[-1].append(nombre)
+
+    def buscar(self, nombre):
+        pila = self.simbolos.get(nombre)
+        return pila[-1][1] if pila else None
+
     def existe_en_actual(self, nombre):
-        return nombre in self.tablas[-1]
\ No newline at end of file
+        pila = self.simbolos.get(nombre)
+        return pila is not None and pila[-1][0] == len(self.registro) - 1
+
+    # Sin tablas bifurcadas, los símbolos se cambian en el lugar
+    def modificable(self, nombre):
+        return self.buscar(nombre)
+
+    @property
+    def tablas(self):
+        tablas = []
+        for nivel, nombres in enumerate(self.registro):
+            tabla = {}
+            for nombre in nombres:
+                for n, simbolo in self.simbolos[nombre]:
+                    if n == nivel:
+                        tabla[nombre] = simbolo
+            tablas.append(tabla)
+        return tablas
\ No newline at end of file